@@ -0,0 +1,165 @@
+"""
+A local stand-in for ODK Aggregate, for benchmarks.
+
+Serves `view/submissionList` (paged with resumptionCursor) and
+`view/downloadSubmission` for every form in mis_2025_tasks.forms. The
+submission XML is generated from the form specs, so it always has the
+structure the parsers expect. Each submission is built deterministically
+from its ID, so repeated runs download identical data.
+"""
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+from mis_2025_tasks.forms import FORMS
+
+WORDS = ("yes", "no", "north", "south", "ea-12", "Abebe", "Tigist", "house 4", "")
+
+_DOWNLOAD_KEY = re.compile(r"^(?P<form>[^\[]+)\[.*\]/data\[@key=(?P<key>.+)\]$")
+
+
+def field_kind(field):
+    """
+    "text", "integer", "decimal" or "gps", worked out from what the field's
+    converter accepts, so new fields need no changes here.
+    """
+    if isinstance(field.convert("1"), tuple):
+        return "gps"
+    try:
+        if isinstance(field.convert("x"), str):
+            return "text"
+    except ValueError:
+        pass
+    try:
+        field.convert("1.5")
+    except ValueError:
+        return "integer"
+    return "decimal"
+
+
+def submission_ids(form_name, start, end):
+    return [f"uuid:{form_name}-{i:07d}" for i in range(start, end)]
+
+
+def submission_xml(spec, instance_id, duplicate_share=0.1):
+    """
+    Synthetic downloadSubmission body for one submission. About
+    `duplicate_share` of the submissions reuse another's rowID, so the
+    census dedup has something to do.
+    """
+    r = random.Random(instance_id)
+    data, meta = [], []
+    for field in spec.fields:
+        if field.source == "attr":
+            continue
+        if field.source == "meta":
+            if field.tag == "rowID" and r.random() < duplicate_share:
+                value = f"row-{r.randrange(1000)}"
+            elif field.tag == "rowID":
+                value = f"row-{instance_id}"
+            else:
+                value = "2025-03-01T08:00:00.000"
+            meta.append(f"<orx:{field.tag}>{escape(value)}</orx:{field.tag}>")
+            continue
+
+        kind = field_kind(field)
+        if kind == "gps":
+            value = f"{r.uniform(3, 15):.6f} {r.uniform(33, 48):.6f} {r.uniform(500, 3000):.1f} {r.uniform(3, 20):.1f}"
+        elif kind == "integer":
+            value = str(r.randrange(100))
+        elif kind == "decimal":
+            value = f"{r.random():.6f}"
+        else:
+            value = r.choice(WORDS)
+        data.append(f"<{field.tag}>{escape(value)}</{field.tag}>")
+
+    return (
+        '<submission xmlns="http://opendatakit.org/submissions" xmlns:orx="http://openrosa.org/xforms">'
+        f'<data><data id="{spec.form_id}" instanceID="{instance_id}">'
+        f'{"".join(data)}<orx:meta><orx:instanceID>{instance_id}</orx:instanceID>{"".join(meta)}</orx:meta>'
+        "</data></data></submission>"
+    ).encode()
+
+
+class FakeAggregate:
+    """
+    Runs the stand-in server on a background thread.
+
+    `counts` maps form name -> number of submissions listed. `latency_ms`
+    delays every response and `error_rate` answers that share of downloads
+    with a 503, to exercise backoff and retries.
+    """
+
+    def __init__(self, counts, latency_ms=0, error_rate=0.0, host="127.0.0.1", port=0):
+        by_form_id = {FORMS[name].form_id: (FORMS[name], count) for name, count in counts.items()}
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like Aggregate behind Tomcat
+            # Headers and body are separate writes; without this each
+            # response waits out the client's delayed ACK (~40ms)
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.requests += 1
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path.endswith("/view/submissionList"):
+                    spec, count = by_form_id.get(query["formId"][0], (None, 0))
+                    self._send(200, self._list_page(spec, count, query))
+                elif url.path.endswith("/view/downloadSubmission"):
+                    match = _DOWNLOAD_KEY.match(query["formId"][0])
+                    spec = match and by_form_id.get(match.group("form"), (None, 0))[0]
+                    if spec is None:
+                        self._send(404, b"")
+                    elif error_rate and random.random() < error_rate:
+                        self._send(503, b"")
+                    else:
+                        self._send(200, submission_xml(spec, match.group("key")))
+                else:
+                    self._send(404, b"")
+
+            def _list_page(self, spec, count, query):
+                start = int(query.get("cursor", ["0"])[0] or 0)
+                end = min(start + int(query.get("numEntries", ["100"])[0]), count)
+                ids = submission_ids(spec.name, start, end) if spec else []
+                cursor = f"<resumptionCursor>{end}</resumptionCursor>" if ids else ""
+                return (
+                    '<idChunk xmlns="http://opendatakit.org/submissions"><idList>'
+                    + "".join(f"<id>{i}</id>" for i in ids)
+                    + f"</idList>{cursor}</idChunk>"
+                ).encode()
+
+            def _send(self, status, body):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/xml; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -3,7 +3,15 @@ from airflow.operators.python import PythonOperator
 from airflow.models import Variable
 from datetime import datetime
 
+from mis_2025_tasks.forms import FORMS
 from mis_2025_tasks.utils.fetch_odk_submission_list import fetch_odk_submission_list
+from mis_2025_tasks.utils.geo import assign_eas
+from mis_2025_tasks.utils.parquet_export import export_form_parquet
+from mis_2025_tasks.utils.profiling import profiled
+from mis_2025_tasks.utils.reparse import reparse_form
+from mis_2025_tasks.utils.schema import ensure_schema
+from mis_2025_tasks.utils.shards import plan_content_shards
+from mis_2025_tasks.utils.streaming import stream_form
 
 from mis_2025_tasks.census.content import census_content
 from mis_2025_tasks.census.remove_duplicate import remove_duplicate_census
@@ -19,103 +27,182 @@ COMMON_CONFIG = {
     "AGG_USERNAME": Variable.get("AGG_USERNAME"),
     "AGG_PASSWORD": Variable.get("AGG_PASSWORD"),
     "NUM_ENTRIES": Variable.get("NUM_ENTRIES", default_var=100),
+    "MAX_NUM_ENTRIES": Variable.get("MAX_NUM_ENTRIES", default_var=1000),
+    "DOWNLOAD_WORKERS": Variable.get("DOWNLOAD_WORKERS", default_var=8),
+    "MAX_DOWNLOAD_WORKERS": Variable.get("MAX_DOWNLOAD_WORKERS", default_var=16),
+    "WRITE_BATCH_SIZE": Variable.get("WRITE_BATCH_SIZE", default_var=200),
+    "FULL_RESYNC_DAYS": Variable.get("FULL_RESYNC_DAYS", default_var=7),
+    "KNOWN_ID_FILTER": Variable.get("KNOWN_ID_FILTER", default_var=True),
+    "WRITE_FLUSH_SECONDS": Variable.get("WRITE_FLUSH_SECONDS", default_var=5),
+    "STREAM_QUEUE_PAGES": Variable.get("STREAM_QUEUE_PAGES", default_var=4),
+    "SHARD_SIZE": Variable.get("SHARD_SIZE", default_var=2000),
+    "MAX_SHARDS": Variable.get("MAX_SHARDS", default_var=16),
+    "CLAIM_LEASE_MINUTES": Variable.get("CLAIM_LEASE_MINUTES", default_var=120),
+    "CLAIM_PAGE_SIZE": Variable.get("CLAIM_PAGE_SIZE", default_var=1000),
+    "ARCHIVE_RAW": Variable.get("ARCHIVE_RAW", default_var=True),
+    "REPARSE_PROCESSES": Variable.get("REPARSE_PROCESSES", default_var=4),
+    "REPARSE_CHUNK_SIZE": Variable.get("REPARSE_CHUNK_SIZE", default_var=500),
+    "RETRY_BASE_MINUTES": Variable.get("RETRY_BASE_MINUTES", default_var=30),
+    "RETRY_MAX_MINUTES": Variable.get("RETRY_MAX_MINUTES", default_var=24 * 60),
+    "RETRY_SHARE": Variable.get("RETRY_SHARE", default_var=0.25),
+    "BREAKER_THRESHOLD": Variable.get("BREAKER_THRESHOLD", default_var=5),
+    "TASK_DEADLINE_MINUTES": Variable.get("TASK_DEADLINE_MINUTES", default_var=300),
+    "RUN_BUDGET_MINUTES": Variable.get("RUN_BUDGET_MINUTES", default_var=330),
+    "METRICS_TEXTFILE_DIR": Variable.get("METRICS_TEXTFILE_DIR", default_var=""),
+    "PROFILE_TASKS": Variable.get("PROFILE_TASKS", default_var=""),
+    "PROFILE_INTERVAL_MS": Variable.get("PROFILE_INTERVAL_MS", default_var=10),
+    "PARQUET_EXPORT_DIR": Variable.get("PARQUET_EXPORT_DIR", default_var=""),
+    "PARQUET_CHUNK_ROWS": Variable.get("PARQUET_CHUNK_ROWS", default_var=100000),
+    "EA_BOUNDARIES_PATH": Variable.get("EA_BOUNDARIES_PATH", default_var=""),
+    "EA_ID_PROPERTY": Variable.get("EA_ID_PROPERTY", default_var="ea"),
+    "EA_ASSIGN_BATCH_SIZE": Variable.get("EA_ASSIGN_BATCH_SIZE", default_var=5000),
+    "SCHEMA_LOCK_TIMEOUT_SECONDS": Variable.get("SCHEMA_LOCK_TIMEOUT_SECONDS", default_var=10),
     "POSTGRES_CONN_ID": "PG-MIS-2025",
 }
 
+# Every form's list/content tasks talk to Aggregate. Point AGGREGATE_POOL at a
+# dedicated pool to cap them across DAGs; AGGREGATE_MAX_TASKS caps them per run.
+AGGREGATE_POOL = Variable.get("AGGREGATE_POOL", default_var="default_pool")
+AGGREGATE_MAX_TASKS = int(Variable.get("AGGREGATE_MAX_TASKS", default_var=8))
+# Content shards of one form running at once
+SHARD_CONCURRENCY = int(Variable.get("SHARD_CONCURRENCY", default_var=4))
+# Download new submissions inside the list task while it is still paging
+STREAM_LIST = str(Variable.get("STREAM_LIST", default_var=False)).lower() in ("1", "true", "yes")
+
+CONTENT_CALLABLES = {
+    "census": census_content,
+    "household": household_content,
+    "member": member_content,
+    "net": net_content,
+    "child": child_content,
+    "visit": visit_content,
+}
+
 with DAG(
     dag_id="MIS-2025",
     start_date=datetime(2025, 1, 1),
     schedule="0 */6 * * *", # Every 6 hours
     catchup=False,
+    max_active_runs=1,
+    max_active_tasks=AGGREGATE_MAX_TASKS,
     default_args={"owner": "airflow", "retries": 1},
     tags=["odk", "aggregate"],
+    params={
+        "full_resync": False, # Trigger with {"full_resync": true} to re-walk every submission list
+        "reset_dead": False, # Trigger with {"reset_dead": true} to retry dead-lettered submissions
+        "profile": False, # Trigger with {"profile": true} to profile every task (see utils/profiling.py)
+    },
 ) as dag:
 
-    # --- CENSUS ---
-    census_list = PythonOperator(
-        task_id="census_list",
-        python_callable=fetch_odk_submission_list,
-        op_kwargs={**COMMON_CONFIG, "form_id": "census", "target_table": "censusids"},
-    )
-
-    census_data = PythonOperator(
-        task_id="census_content",
-        python_callable=census_content,
+    # --- SETUP ---
+    schema = PythonOperator(
+        task_id="ensure_schema",
+        python_callable=profiled(ensure_schema),
         op_kwargs=COMMON_CONFIG,
     )
 
+    # --- ONE INDEPENDENT BRANCH PER FORM: list >> shards >> content[shard] ---
+    branches = {}
+    for name, spec in FORMS.items():
+        form_list = PythonOperator(
+            task_id=f"{name}_list",
+            python_callable=profiled(stream_form if STREAM_LIST else fetch_odk_submission_list),
+            op_kwargs={**COMMON_CONFIG, "form": name, "form_id": spec.form_id, "target_table": spec.ids_table},
+            pool=AGGREGATE_POOL,
+            max_active_tis_per_dag=1,
+        )
+
+        form_shards = PythonOperator(
+            task_id=f"{name}_shards",
+            python_callable=profiled(plan_content_shards),
+            op_kwargs={**COMMON_CONFIG, "form": name},
+        )
+
+        # One mapped instance per shard; each claims its own slice of the *ids table
+        form_data = PythonOperator.partial(
+            task_id=f"{name}_content",
+            python_callable=profiled(CONTENT_CALLABLES[name]),
+            op_kwargs=COMMON_CONFIG,
+            pool=AGGREGATE_POOL,
+            max_active_tis_per_dagrun=SHARD_CONCURRENCY,
+        ).expand(templates_dict=form_shards.output)
+
+        schema >> form_list >> form_shards >> form_data
+        branches[name] = form_data
+
+    # --- CENSUS DEDUP (stays inside the census branch) ---
+    # Also runs when the content step was skipped: with STREAM_LIST the list
+    # task ingests the rows itself and leaves no shards.
     remove_duplicate = PythonOperator(
         task_id="remove_duplicate_census",
-        python_callable=remove_duplicate_census,
+        python_callable=profiled(remove_duplicate_census),
         op_kwargs=COMMON_CONFIG,
+        trigger_rule="none_failed",
     )
 
-    # --- HOUSEHOLD ---
-    household_list = PythonOperator(
-        task_id="household_list",
-        python_callable=fetch_odk_submission_list,
-        op_kwargs={**COMMON_CONFIG, "form_id": "household", "target_table": "householdids"},
-    )
-
-    household_data = PythonOperator(
-        task_id="household_content",
-        python_callable=household_content,
-        op_kwargs=COMMON_CONFIG,
-    )
-
-    # --- MEMBER ---
-    member_list = PythonOperator(
-        task_id="member_list",
-        python_callable=fetch_odk_submission_list,
-        op_kwargs={**COMMON_CONFIG, "form_id": "household_member", "target_table": "memberids"},
-    )
-
-    member_data = PythonOperator(
-        task_id="member_content",
-        python_callable=member_content,
-        op_kwargs=COMMON_CONFIG,
-    )
-
-    # --- NET ---
-    net_list = PythonOperator(
-        task_id="net_list",
-        python_callable=fetch_odk_submission_list,
-        op_kwargs={**COMMON_CONFIG, "form_id": "net", "target_table": "netids"},
-    )
-
-    net_data = PythonOperator(
-        task_id="net_content",
-        python_callable=net_content,
-        op_kwargs=COMMON_CONFIG,
-    )
-
-    # --- CHILDREN ---
-    child_list = PythonOperator(
-        task_id="child_list",
-        python_callable=fetch_odk_submission_list,
-        op_kwargs={**COMMON_CONFIG, "form_id": "child", "target_table": "childids"},
-    )
-
-    child_data = PythonOperator(
-        task_id="child_content",
-        python_callable=child_content,
+    branches["census"] >> remove_duplicate
+    branches["census"] = remove_duplicate
+
+    # --- EA ASSIGNMENT: forms with GPS points, once their rows are in ---
+    for name, spec in FORMS.items():
+        if spec.gps_fields:
+            form_eas = PythonOperator(
+                task_id=f"{name}_assign_eas",
+                python_callable=profiled(assign_eas),
+                op_kwargs={**COMMON_CONFIG, "form": name},
+                trigger_rule="none_failed",
+            )
+            branches[name] >> form_eas
+            branches[name] = form_eas
+
+    # --- PARQUET EXPORT: new rows of each form once its branch is done ---
+    # Also runs when the content step was skipped: a streaming list task
+    # may have ingested rows on its own.
+    for name, last_step in branches.items():
+        last_step >> PythonOperator(
+            task_id=f"{name}_export",
+            python_callable=profiled(export_form_parquet),
+            op_kwargs={**COMMON_CONFIG, "form": name},
+            trigger_rule="none_failed",
+        )
+
+
+# Manual re-derivation of form tables from the raw_submissions archive,
+# e.g. after adding a column to a form spec. No Aggregate traffic.
+with DAG(
+    dag_id="MIS-2025-reparse",
+    start_date=datetime(2025, 1, 1),
+    schedule=None,
+    catchup=False,
+    max_active_runs=1,
+    default_args={"owner": "airflow", "retries": 0},
+    tags=["odk", "backfill"],
+    params={
+        "forms": list(FORMS), # Trigger with e.g. {"forms": ["household"]}
+        "profile": False, # Trigger with {"profile": true} to profile the re-parse tasks
+    },
+) as reparse_dag:
+
+    reparse_schema = PythonOperator(
+        task_id="ensure_schema",
+        python_callable=profiled(ensure_schema),
         op_kwargs=COMMON_CONFIG,
     )
 
-    # --- VISIT ---
-    visit_list = PythonOperator(
-        task_id="visit_list",
-        python_callable=fetch_odk_submission_list,
-        op_kwargs={**COMMON_CONFIG, "form_id": "visit", "target_table": "visitids"},
-    )
-
-    visit_data = PythonOperator(
-        task_id="visit_content",
-        python_callable=visit_content,
+    reparse_tasks = {}
+    for name in FORMS:
+        reparse_tasks[name] = PythonOperator(
+            task_id=f"{name}_reparse",
+            python_callable=profiled(reparse_form),
+            op_kwargs={**COMMON_CONFIG, "form": name},
+        )
+        reparse_schema >> reparse_tasks[name]
+
+    # Re-parse upserts every archived census row again, including the
+    # duplicates dedup had deleted; they are queued, so dedup removes them.
+    reparse_tasks["census"] >> PythonOperator(
+        task_id="remove_duplicate_census",
+        python_callable=profiled(remove_duplicate_census),
         op_kwargs=COMMON_CONFIG,
+        trigger_rule="none_failed",
     )
-
-    # Dependency Chain
-    census_list >> census_data >> remove_duplicate >> household_list >> household_data >> member_list >> member_data >> \
-    net_list >> net_data >> child_list >> child_data >> visit_list >> visit_data
-
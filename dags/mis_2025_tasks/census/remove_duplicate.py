@@ -4,14 +4,25 @@ def remove_duplicate_census(**kwargs):
     """
     Deduplicates the census table based on rowID.
     Prioritizes records where selected > 0 and random > 0.
+
+    Only rowIDs queued in census_dedup_queue by census upserts since the
+    last run are re-ranked, so the cost follows the new data rather than
+    the table size. Ranking is unchanged, so the survivors are the same as
+    with a full-table pass.
     """
     POSTGRES_CONN_ID = kwargs.get("POSTGRES_CONN_ID", "PG-MIS-2025")
     pg = PostgresHook(postgres_conn_id=POSTGRES_CONN_ID)
     
     # The CTE identifies duplicates and ranks them based on your priorities
-    # rn = 1 is the 'winner' we keep.
+    # rn = 1 is the 'winner' we keep. The queue is drained in the same
+    # statement; rowIDs queued by writers that commit later stay for next run.
+    # PARTITION BY puts all NULL rowIDs in one group, hence the IS NULL branch.
     dedup_sql = """
-        WITH prioritized_rows AS (
+        WITH touched AS (
+            DELETE FROM census_dedup_queue
+            RETURNING rowid
+        ),
+        prioritized_rows AS (
             SELECT 
                 instanceID,
                 ROW_NUMBER() OVER (
@@ -22,6 +33,8 @@ def remove_duplicate_census(**kwargs):
                         instanceID ASC       
                 ) as rn
             FROM census
+            WHERE rowID IN (SELECT rowid FROM touched)
+               OR (rowID IS NULL AND EXISTS (SELECT 1 FROM touched WHERE rowid IS NULL))
         )
         DELETE FROM census
         WHERE instanceID IN (
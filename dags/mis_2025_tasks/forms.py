@@ -0,0 +1,132 @@
+"""
+Declarative definitions of the MIS-2025 ODK forms.
+
+Each FormSpec names the ODK form, its target and tracking tables, and the
+XML field -> column mapping used by the generic content engine. Adding a
+form means adding a spec here and wiring its tasks in the DAG.
+"""
+from mis_2025_tasks.utils.form_spec import FormSpec, decimal, gps, instance_id, integer, meta, text
+
+CENSUS = FormSpec(
+    name="census",
+    form_id="census",
+    target_table="census",
+    ids_table="censusids",
+    key_column="instanceID",
+    dedup_queue="census_dedup_queue",
+    dedup_key="rowID",
+    fields=(
+        instance_id("instanceID"),
+        meta("rowID"),
+        text("createdDate"),
+        text("dateLastSelected"),
+        text("deviceId"),
+        text("excluded"),
+        text("placeName"),
+        text("headName"),
+        text("houseNumber"),
+        gps("location"),
+        decimal("random", default=0),
+        integer("selected", default=0),
+        integer("valid", default=0),
+        decimal("sampleFrame", default=0),
+    ),
+)
+
+HOUSEHOLD = FormSpec(
+    name="household",
+    form_id="household",
+    target_table="household",
+    ids_table="householdids",
+    fields=(
+        instance_id(),
+        meta("rowid", "rowID"),
+        meta("savepointtimestamp", "savepointTimestamp"),
+        text("region"),
+        text("zone"),
+        text("district"),
+        text("ea"),
+        gps("gps_location"),
+        text("data_collector"),
+        text("data_collector_name"),
+        text("have_nets"),
+        text("how_many_nets"),
+        text("is_consent_given"),
+        text("hh_quest_start_time"),
+        text("hh_quest_end_time"),
+    ),
+)
+
+MEMBER = FormSpec(
+    name="member",
+    form_id="household_member",
+    target_table="member",
+    ids_table="memberids",
+    fields=(
+        instance_id(),
+        meta("rowid", "rowID"),
+        text("household_id"),
+        integer("age_in_years"),
+        integer("age_in_months"),
+        integer("age_in_days"),
+        text("gender"),
+        text("sleep_under_net"),
+        text("which_net"),
+        text("is_consent_given"),
+        text("is_present_4_test"),
+        text("is_haemo_measured"),
+        text("rdt_result"),
+        text("blood_slide"),
+        text("dbs"),
+        text("is_woman_consent_given"),
+        text("is_pregnant_now"),
+        text("woman_quest_start_time"),
+        text("woman_quest_end_time"),
+    ),
+)
+
+NET = FormSpec(
+    name="net",
+    form_id="net",
+    target_table="net",
+    ids_table="netids",
+    any_data_block=True,
+    fields=(
+        instance_id(),
+        meta("rowid", "rowID"),
+        text("household_id"),
+        text("any_one_sleep_under_this_net"),
+    ),
+)
+
+CHILD = FormSpec(
+    name="child",
+    form_id="child",
+    target_table="child",
+    ids_table="childids",
+    any_data_block=True,
+    fields=(
+        instance_id(),
+        meta("rowid", "rowID"),
+        text("household_id"),
+        text("mother_id"),
+    ),
+)
+
+VISIT = FormSpec(
+    name="visit",
+    form_id="visit",
+    target_table="visit",
+    ids_table="visitids",
+    any_data_block=True,
+    fields=(
+        instance_id(),
+        meta("rowid", "rowID"),
+        text("household_id"),
+        text("visit_number"),
+        text("visit_result"),
+    ),
+)
+
+# In DAG order
+FORMS = {spec.name: spec for spec in (CENSUS, HOUSEHOLD, MEMBER, NET, CHILD, VISIT)}
@@ -0,0 +1,23 @@
+"""
+Survey indicator summaries, maintained as submissions are ingested.
+
+Each Summary counts a form table's rows per combination of its dimensions
+(see utils/summary.py); ensure_schema creates and seeds the tables.
+Dashboards read these small tables instead of scanning the form tables,
+e.g. net ownership in one zone:
+
+    SELECT have_nets, sum(records) FROM household_nets_summary
+    WHERE region = '...' AND zone = '...'
+    GROUP BY have_nets
+"""
+from mis_2025_tasks.forms import HOUSEHOLD, MEMBER
+from mis_2025_tasks.utils.summary import Summary
+
+SUMMARIES = (
+    # Households with nets, by area
+    Summary("household_nets_summary", HOUSEHOLD.target_table, ("region", "zone", "district", "ea", "have_nets")),
+    # Net use
+    Summary("member_net_use_summary", MEMBER.target_table, ("sleep_under_net",)),
+    # RDT positivity
+    Summary("member_rdt_summary", MEMBER.target_table, ("rdt_result",)),
+)
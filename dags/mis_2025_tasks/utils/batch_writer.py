@@ -0,0 +1,270 @@
+import gzip
+import hashlib
+import time
+import zlib
+
+from psycopg2 import Binary
+from psycopg2.extras import execute_values
+
+from mis_2025_tasks.utils.failures import classify_failure
+
+
+class BatchWriter:
+    """
+    Collects parsed records and writes them `batch_size` at a time.
+
+    Each flush upserts the batch into `target_table` and sets the matching
+    `ids_table` statuses in a single transaction, so a crashed worker loses
+    at most one batch of progress. If the batch is rejected by Postgres the
+    records are retried one by one so a single bad row only fails itself.
+
+    With `archive_form_id` set, the raw XML handed to add()/add_failure() is
+    stored gzipped in raw_submissions in the same transaction.
+
+    Every status write bumps the ID's attempt count. Transient failures are
+    'failed' with a next_attempt_at that doubles per attempt from
+    `retry_base_minutes` up to `retry_max_minutes`; deterministic ones are
+    'dead' and no longer picked up. With `record_attempts` off (re-parse,
+    which makes no download attempt) only successes are written, as a bare
+    'success' status; attempt counts and last errors are kept.
+
+    Each batch is upserted by one prepared statement over `columns` (by
+    default the first record's keys), prepared once per connection. None
+    values never overwrite what is stored.
+
+    With `dedup_queue` set, the `dedup_key` of every upserted row (as
+    stored, after the upsert) is appended to that queue table in the same
+    transaction.
+
+    With `flush_seconds` set, a batch is also written once its oldest
+    entry has waited that long, so a slow trickle of records still lands
+    promptly. That is checked on add() and on flush_if_due(), which the
+    caller runs while it has nothing to add.
+
+    With `metrics` (TaskMetrics) set, the time spent in the write
+    statements and in commit is recorded per batch.
+    """
+
+    def __init__(self, conn, target_table, ids_table, key_column="instanceid", batch_size=200,
+                 archive_form_id=None, retry_base_minutes=30, retry_max_minutes=24 * 60,
+                 dedup_queue=None, dedup_key=None, metrics=None, flush_seconds=None, columns=None,
+                 record_attempts=True):
+        self.conn = conn
+        self.target_table = target_table
+        self.ids_table = ids_table
+        self.key_column = key_column
+        self.batch_size = max(1, int(batch_size))
+        self.archive_form_id = archive_form_id
+        self.retry_base_minutes = int(retry_base_minutes)
+        self.retry_max_minutes = int(retry_max_minutes)
+        self.dedup_queue = dedup_queue
+        self.dedup_key = dedup_key
+        self.metrics = metrics
+        self.flush_seconds = flush_seconds
+        self.columns = tuple(columns) if columns else None
+        self.record_attempts = record_attempts
+        self._prepared = None
+        self._batch_started = None
+        self.records = []
+        self.failed_ids = []
+        self.raw = []
+        self.total_success = 0
+        self.total_failed = 0
+
+    def add(self, submission_id, record, raw=None):
+        self.records.append((submission_id, record))
+        self._keep_raw(submission_id, raw)
+        self._maybe_flush()
+
+    def add_failure(self, submission_id, error, raw=None):
+        # Failed parses are archived too, so they can be re-parsed once fixed
+        self.failed_ids.append(self._failure_status(submission_id, error))
+        self._keep_raw(submission_id, raw)
+        self._maybe_flush()
+
+    @staticmethod
+    def _failure_status(submission_id, error):
+        error_class, transient = classify_failure(error)
+        return submission_id, "failed" if transient else "dead", error_class
+
+    def _keep_raw(self, submission_id, raw):
+        if self.archive_form_id is not None and raw is not None:
+            self.raw.append((submission_id, raw))
+
+    def _maybe_flush(self):
+        if self._batch_started is None:
+            self._batch_started = time.monotonic()
+        if len(self.records) + len(self.failed_ids) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """Flushes if `flush_seconds` is set and the oldest waiting entry is that old."""
+        if (self.flush_seconds is not None and self._batch_started is not None
+                and time.monotonic() - self._batch_started >= self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        records, failed_ids, raw = self.records, self.failed_ids, self.raw
+        self.records, self.failed_ids, self.raw = [], [], []
+        self._batch_started = None
+        if not records and not failed_ids:
+            return
+
+        try:
+            started = time.monotonic()
+            with self.conn.cursor() as cursor:
+                self._upsert(cursor, [record for _, record in records])
+                self._set_statuses(cursor, [(sid, "success", None) for sid, _ in records] + failed_ids)
+                self._archive(cursor, raw)
+            written = time.monotonic()
+            self.conn.commit()
+            if self.metrics is not None:
+                self.metrics.timing("db_write_seconds", written - started)
+                self.metrics.timing("db_commit_seconds", time.monotonic() - written)
+            self.total_success += len(records)
+            self.total_failed += len(failed_ids)
+        except Exception as e:
+            print(f"Batch write to {self.target_table} failed ({e}), retrying {len(records)} records one by one")
+            self.conn.rollback()
+            started = time.monotonic()
+            self._flush_one_by_one(records, failed_ids, raw)
+            if self.metrics is not None:
+                self.metrics.timing("db_fallback_seconds", time.monotonic() - started)
+
+    def _flush_one_by_one(self, records, failed_ids, raw):
+        for submission_id, record in records:
+            try:
+                with self.conn.cursor() as cursor:
+                    self._upsert(cursor, [record])
+                    self._set_statuses(cursor, [(submission_id, "success", None)])
+                self.conn.commit()
+                self.total_success += 1
+            except Exception as e:
+                self.conn.rollback()
+                failed_ids.append(self._failure_status(submission_id, e))
+
+        if failed_ids or raw:
+            with self.conn.cursor() as cursor:
+                if failed_ids:
+                    self._set_statuses(cursor, failed_ids)
+                self._archive(cursor, raw)
+            self.conn.commit()
+            self.total_failed += len(failed_ids)
+
+    def _upsert(self, cursor, records):
+        if not records:
+            return
+        columns = self.columns or tuple(records[0])
+        name, types = self._prepare(cursor, columns)
+
+        # ON CONFLICT can't touch a row twice in one statement, so records
+        # for the same key are merged first: later non-None values win, as
+        # they would if the records were upserted one after the other.
+        by_key, keyless = {}, []
+        for record in records:
+            key = record.get(self.key_column)
+            if key is None:
+                keyless.append(record)
+            elif key in by_key:
+                by_key[key] = {**by_key[key], **{c: v for c, v in record.items() if v is not None}}
+            else:
+                by_key[key] = record
+        rows = list(by_key.values()) + keyless
+
+        arrays = [[record.get(c) for record in rows] for c in columns]
+        casts = ", ".join(f"%s::{t}[]" for t in types)
+        cursor.execute(f"EXECUTE {name} ({casts})", arrays)
+
+    def _prepare(self, cursor, columns):
+        """
+        Prepares this table's upsert once per connection. Returns its name
+        and the column types, which the arrays it takes are cast to.
+
+        The whole batch is passed as one array per column and unnested, so
+        the statement text is the same for every batch and Postgres plans it
+        once. The "never overwrite with NULL" rule is kept by COALESCE-ing
+        every column with the stored value; a new row still gets NULLs.
+        """
+        name = f"upsert_{self.target_table}_{zlib.crc32(','.join(columns).encode()):08x}"
+        if self._prepared is not None and self._prepared[0] == name:
+            return self._prepared
+
+        cursor.execute("""
+            SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        """, (self.target_table,))
+        table_types = dict(cursor.fetchall())
+        # Unquoted identifiers such as instanceID are stored lower-cased
+        types = [table_types[c.lower()] for c in columns]
+
+        cursor.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (name,))
+        if cursor.fetchone() is None:
+            params = ", ".join(f"{t}[]" for t in types)
+            arrays = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+            updates = ", ".join(f"{c} = COALESCE(EXCLUDED.{c}, t.{c})" for c in columns if c != self.key_column)
+            upsert = f"""
+                INSERT INTO {self.target_table} AS t ({', '.join(columns)})
+                SELECT * FROM unnest({arrays})
+                ON CONFLICT ({self.key_column}) {f"DO UPDATE SET {updates}" if updates else "DO NOTHING"}
+            """
+            if self.dedup_queue:
+                # Queue the stored (post-upsert) keys in the same statement
+                upsert = f"""
+                    WITH upserted AS ({upsert} RETURNING t.{self.dedup_key})
+                    INSERT INTO {self.dedup_queue} SELECT DISTINCT {self.dedup_key} FROM upserted
+                """
+            cursor.execute(f"PREPARE {name} ({params}) AS {upsert}")
+        self._prepared = (name, types)
+        return self._prepared
+
+    def _set_statuses(self, cursor, statuses):
+        if not self.record_attempts:
+            ids = [(sid,) for sid, status, _ in statuses if status == "success"]
+            if ids:
+                execute_values(
+                    cursor,
+                    f"""
+                        UPDATE {self.ids_table} AS t SET status = 'success', next_attempt_at = NULL
+                        FROM (VALUES %s) AS v(id) WHERE t.id = v.id
+                    """,
+                    ids,
+                    page_size=len(ids),
+                )
+            return
+        execute_values(
+            cursor,
+            f"""
+                UPDATE {self.ids_table} AS t
+                SET status = v.status,
+                    attempts = t.attempts + 1,
+                    last_error = v.error_class,
+                    next_attempt_at = CASE WHEN v.status = 'failed' THEN now() + LEAST(
+                        {self.retry_base_minutes} * power(2, t.attempts), {self.retry_max_minutes}
+                    ) * interval '1 minute' END
+                FROM (VALUES %s) AS v(id, status, error_class)
+                WHERE t.id = v.id
+            """,
+            statuses,
+            page_size=len(statuses),
+        )
+
+    def _archive(self, cursor, raw):
+        if not raw:
+            return
+        rows = {
+            sid: (self.archive_form_id, sid, hashlib.sha256(content).hexdigest(), Binary(gzip.compress(content, mtime=0)))
+            for sid, content in raw
+        }
+        execute_values(
+            cursor,
+            """
+                INSERT INTO raw_submissions (form_id, instance_id, sha256, xml_gz)
+                VALUES %s
+                ON CONFLICT (form_id, instance_id) DO UPDATE
+                SET sha256 = EXCLUDED.sha256, xml_gz = EXCLUDED.xml_gz, fetched_at = now()
+            """,
+            list(rows.values()),
+            page_size=len(rows),
+        )
@@ -0,0 +1,69 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+
+def is_outage_error(error):
+    """
+    True for errors that say Aggregate itself is down or struggling rather
+    than something being wrong with one submission.
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """
+    Trips after `threshold` consecutive outage errors from Aggregate.
+
+    Shared by the download threads of a task, so every response is recorded
+    under a lock. Any other answer from the server resets the count. Once
+    open it stays open for the rest of the task.
+    """
+
+    def __init__(self, threshold=5):
+        self.threshold = max(1, int(threshold))
+        self.consecutive_failures = 0
+        self.is_open = False
+        self._lock = threading.Lock()
+
+    def record(self, error=None):
+        with self._lock:
+            if error is None or not is_outage_error(error):
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.threshold and not self.is_open:
+                self.is_open = True
+                print(f"Circuit breaker OPEN after {self.consecutive_failures} consecutive Aggregate errors: {error}")
+
+
+def run_seconds_left(kwargs):
+    """
+    Seconds left of the DAG run's RUN_BUDGET_MINUTES (default 330), counted
+    from dag_run.start_date; None outside a DAG run.
+    """
+    start = getattr(kwargs.get("dag_run"), "start_date", None)
+    if start is None:
+        return None
+    budget = float(kwargs.get("RUN_BUDGET_MINUTES", 330)) * 60
+    return budget - (datetime.now(timezone.utc) - start).total_seconds()
+
+
+def task_deadline(kwargs):
+    """
+    time.monotonic() value after which a list or content task takes no new
+    work: TASK_DEADLINE_MINUTES (default 300) after it starts, or when the
+    run budget is spent if that comes first. Shards queued behind others
+    start late, so the task limit alone would let a run overrun.
+    """
+    seconds = float(kwargs.get("TASK_DEADLINE_MINUTES", 300)) * 60
+    left = run_seconds_left(kwargs)
+    if left is not None:
+        seconds = min(seconds, left)
+    return time.monotonic() + seconds
@@ -0,0 +1,123 @@
+import time
+
+from airflow.exceptions import AirflowFailException
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+
+from mis_2025_tasks.utils.batch_writer import BatchWriter
+from mis_2025_tasks.utils.circuit_breaker import CircuitBreaker, task_deadline
+from mis_2025_tasks.utils.download_submissions import download_submissions, make_session
+from mis_2025_tasks.utils.form_spec import parse_submission
+from mis_2025_tasks.utils.metrics import TaskMetrics
+from mis_2025_tasks.utils.rate_control import AimdLimit
+from mis_2025_tasks.utils.shards import PendingIds, claim_owner, release_claims
+
+# Failures printed in full per task; the rest are only counted
+LOGGED_FAILURES = 10
+
+
+def ingest_form_content(spec, **kwargs):
+    """
+    Downloads the pending submissions of `spec`'s form (a shard's worth when
+    mapped), parses them with the spec's field mapping and upserts them into
+    the form's table, marking each ID in the tracking table.
+    """
+    AGGREGATE_URL = kwargs["AGGREGATE_URL"].rstrip("/")
+    AGG_USERNAME = kwargs["AGG_USERNAME"]
+    AGG_PASSWORD = kwargs["AGG_PASSWORD"]
+    POSTGRES_CONN_ID = kwargs["POSTGRES_CONN_ID"]
+    DOWNLOAD_WORKERS = int(kwargs.get("DOWNLOAD_WORKERS", 8))
+    MAX_DOWNLOAD_WORKERS = max(DOWNLOAD_WORKERS, int(kwargs.get("MAX_DOWNLOAD_WORKERS", 2 * DOWNLOAD_WORKERS)))
+    WRITE_BATCH_SIZE = int(kwargs.get("WRITE_BATCH_SIZE", 200))
+    CLAIM_LEASE_MINUTES = int(kwargs.get("CLAIM_LEASE_MINUTES", 120))
+    CLAIM_PAGE_SIZE = int(kwargs.get("CLAIM_PAGE_SIZE", 1000))
+    RETRY_SHARE = float(kwargs.get("RETRY_SHARE", 0.25))
+    ARCHIVE_RAW = str(kwargs.get("ARCHIVE_RAW", True)).lower() in ("1", "true", "yes")
+    RETRY_BASE_MINUTES = int(kwargs.get("RETRY_BASE_MINUTES", 30))
+    RETRY_MAX_MINUTES = int(kwargs.get("RETRY_MAX_MINUTES", 24 * 60))
+    BREAKER_THRESHOLD = int(kwargs.get("BREAKER_THRESHOLD", 5))
+    METRICS_TEXTFILE_DIR = kwargs.get("METRICS_TEXTFILE_DIR") or None
+
+    deadline = task_deadline(kwargs)
+    breaker = CircuitBreaker(BREAKER_THRESHOLD)
+
+    shard = kwargs.get("templates_dict") or {}
+    if time.monotonic() >= deadline:
+        print(f"Run budget spent; pending {spec.name} submissions are left for the next run.")
+        return
+    owner = claim_owner(kwargs)
+    metrics = TaskMetrics("content", spec.name, shard.get("shard"), METRICS_TEXTFILE_DIR)
+
+    pg = PostgresHook(postgres_conn_id=POSTGRES_CONN_ID)
+
+    # Claims are made page by page on their own connection, as the
+    # downloads reach them; the other connection only writes results.
+    with pg.get_conn() as conn, pg.get_conn() as claim_conn:
+        # In streaming mode the list task hands over IDs it claimed for us
+        pending = kwargs.get("ids")
+        if pending is None:
+            pending = PendingIds(
+                claim_conn, spec, owner, shard.get("size"), CLAIM_LEASE_MINUTES, CLAIM_PAGE_SIZE, RETRY_SHARE,
+            )
+            label = f" (shard {shard['shard']})" if "shard" in shard else ""
+            if pending.empty:
+                print(f"No pending {spec.name} submissions to claim{label}. Nothing to do.")
+                return
+            print(f"Processing pending {spec.name} submissions{label}, claiming {CLAIM_PAGE_SIZE} at a time")
+
+        try:
+            session = make_session(AGG_USERNAME, AGG_PASSWORD, MAX_DOWNLOAD_WORKERS)
+            limit = AimdLimit(f"{spec.name} downloads in flight", DOWNLOAD_WORKERS, maximum=MAX_DOWNLOAD_WORKERS)
+            writer = BatchWriter(
+                conn, spec.target_table, spec.ids_table, key_column=spec.key_column, batch_size=WRITE_BATCH_SIZE,
+                archive_form_id=spec.form_id if ARCHIVE_RAW else None,
+                retry_base_minutes=RETRY_BASE_MINUTES, retry_max_minutes=RETRY_MAX_MINUTES,
+                dedup_queue=spec.dedup_queue, dedup_key=spec.dedup_key, metrics=metrics, columns=spec.columns,
+                flush_seconds=kwargs.get("flush_seconds"),
+            )
+            # At the deadline or once the breaker trips no new downloads
+            # start; finished work is still flushed and the rest stays pending
+            downloads = download_submissions(
+                session, AGGREGATE_URL, spec.form_id, pending, max_workers=MAX_DOWNLOAD_WORKERS,
+                breaker=breaker, should_stop=lambda: breaker.is_open or time.monotonic() > deadline, limit=limit,
+                metrics=metrics,
+            )
+            failures = 0
+            for submission_id, content, error in downloads:
+                if submission_id is None:
+                    writer.flush_if_due()  # the list stream has nothing new yet
+                    continue
+                if error is not None and breaker.is_open:
+                    continue  # Aggregate is down; not this submission's fault
+                try:
+                    if error is not None:
+                        raise error
+                    with metrics.timer("parse_seconds"):
+                        record = parse_submission(spec, content, submission_id)
+                    writer.add(submission_id, record, raw=content)
+                except Exception as e:
+                    failures += 1
+                    if failures <= LOGGED_FAILURES:
+                        print(f"FAILED {spec.name} {submission_id}: {e}")
+                    writer.add_failure(submission_id, e, raw=content)
+
+            writer.flush()
+        finally:
+            release_claims(claim_conn, spec, owner)
+
+    left = pending.claimed - writer.total_success - writer.total_failed
+    print(f"{spec.name} DONE → Claimed: {pending.claimed}, Success: {writer.total_success}, Failed: {writer.total_failed}, Left pending: {left}")
+    metrics.incr("success", writer.total_success)
+    metrics.incr("failed", writer.total_failed)
+    metrics.incr("skipped", left)
+    summary = metrics.finish()
+    if breaker.is_open:
+        raise AirflowFailException(
+            f"ODK Aggregate looks down ({BREAKER_THRESHOLD} consecutive errors); "
+            f"stopped with {left} {spec.name} submissions left pending"
+        )
+    if time.monotonic() > deadline:
+        print("Task deadline or run budget reached; the rest is left for the next run.")
+    return {
+        "form": spec.name, "success": writer.total_success, "failed": writer.total_failed, "left": left,
+        "metrics": summary,
+    }
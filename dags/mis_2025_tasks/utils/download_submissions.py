@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPDigestAuth
+
+
+def make_session(username, password, max_workers=1):
+    """
+    Build an Aggregate session whose connection pool is large enough
+    for `max_workers` concurrent downloads.
+    """
+    session = requests.Session()
+    session.auth = HTTPDigestAuth(username, password)
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def submission_url(aggregate_url, form_id, submission_id):
+    form_path = f"{form_id}[@version=null and @uiVersion=null]/data[@key={submission_id}]"
+    return f"{aggregate_url}/view/downloadSubmission?formId={quote(form_path, safe='')}"
+
+
+def _download(session, url, timeout, breaker, limit, metrics):
+    started = time.monotonic()
+    try:
+        resp = session.get(url, timeout=timeout)
+        resp.raise_for_status()
+    except Exception as e:
+        if breaker is not None:
+            breaker.record(e)
+        if limit is not None:
+            limit.observe(error=e)
+        raise
+    if breaker is not None:
+        breaker.record()
+    elapsed = time.monotonic() - started
+    if limit is not None:
+        limit.observe(elapsed)
+    if metrics is not None:
+        metrics.timing("download_seconds", elapsed)
+        metrics.size("response_bytes", len(resp.content))
+    return resp.content
+
+
+def download_submissions(session, aggregate_url, form_id, ids, max_workers=8, timeout=90,
+                         breaker=None, should_stop=None, limit=None, metrics=None):
+    """
+    Download submissions on a bounded thread pool.
+
+    Yields (submission_id, content, error) in the same order as `ids`, so
+    the caller can parse and write on its own thread exactly as before.
+    At most `max_workers * 2` downloads are queued ahead of the consumer,
+    which keeps memory flat however long the ID list is.
+
+    Every response is reported to `breaker`. Once `should_stop()` returns
+    True no new downloads are started; those already queued are still
+    yielded.
+
+    With an AimdLimit as `limit`, requests in flight are kept at or below
+    `limit.value`, which adapts to how Aggregate responds; `max_workers`
+    is then only the ceiling.
+
+    Successful downloads are timed and sized into `metrics` (TaskMetrics).
+
+    `ids` may yield None for "nothing yet" (see streaming.ListStream).
+    Finished downloads are then handed over before `ids` is asked again,
+    and when nothing is in flight (None, None, None) is yielded, so the
+    caller can do time-based work such as flushing.
+    """
+    max_workers = max(1, int(max_workers))
+    window = max_workers * 2
+    pending = deque()
+    ids = iter(ids)
+    in_flight = [0]
+    idle = [False]
+    lock = threading.Lock()
+
+    def run(url):
+        try:
+            return _download(session, url, timeout, breaker, limit, metrics)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{form_id}-dl") as pool:
+        def submit_next():
+            if len(pending) >= window:
+                return False
+            if limit is not None and in_flight[0] >= limit.value:
+                return False
+            if should_stop is not None and should_stop():
+                return False
+            # Asking a waiting source again blocks; hand over what is done first
+            if idle[0] and pending and pending[0][1].done():
+                return False
+            for submission_id in ids:
+                idle[0] = submission_id is None
+                if idle[0]:
+                    return False
+                url = submission_url(aggregate_url, form_id, submission_id)
+                with lock:
+                    in_flight[0] += 1
+                pending.append((submission_id, pool.submit(run, url)))
+                return True
+            return False
+
+        try:
+            while True:
+                # Refilled after each result, so in-flight requests follow
+                # the limit as it moves
+                while submit_next():
+                    pass
+                if not pending:
+                    if not idle[0]:
+                        break
+                    idle[0] = False
+                    yield None, None, None
+                    continue
+                submission_id, future = pending.popleft()
+                try:
+                    content, error = future.result(), None
+                except Exception as e:
+                    content, error = None, e
+                yield submission_id, content, error
+        finally:
+            # Stopped early: drop whatever has not started yet
+            for _, future in pending:
+                future.cancel()
@@ -0,0 +1,39 @@
+import xml.etree.ElementTree as ET
+
+import psycopg2
+import requests
+
+try:
+    from lxml.etree import XMLSyntaxError
+except ImportError:
+    XMLSyntaxError = ET.ParseError
+
+# Aggregate answers that say "try again later" rather than "this is broken"
+TRANSIENT_HTTP_STATUSES = {401, 403, 408, 429}
+
+
+def classify_failure(error):
+    """
+    Returns (error_class, transient) for a failed submission.
+
+    Transient failures (timeouts, connection errors, 5xx/429, lock or
+    connection trouble in Postgres) are retried with exponential backoff.
+    Deterministic ones (malformed XML, missing data block, values the
+    converters or the table reject, 404s) go to the 'dead' status and are
+    skipped until reset.
+    """
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout", True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "connection", True
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        transient = status is None or status >= 500 or status in TRANSIENT_HTTP_STATUSES
+        return f"http_{status}", transient
+    if isinstance(error, (ET.ParseError, XMLSyntaxError)):
+        return "xml_syntax", False
+    if isinstance(error, (psycopg2.DataError, psycopg2.IntegrityError)):
+        return "db_rejected", False
+    if isinstance(error, ValueError):
+        return "invalid_data", False
+    return type(error).__name__, True
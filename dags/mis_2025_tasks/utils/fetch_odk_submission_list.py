@@ -1,12 +1,74 @@
-import requests
+import time
 import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from airflow.exceptions import AirflowFailException
 from airflow.providers.postgres.hooks.postgres import PostgresHook
-from requests.auth import HTTPDigestAuth
+
+from mis_2025_tasks.utils.circuit_breaker import CircuitBreaker, task_deadline
+from mis_2025_tasks.utils.download_submissions import make_session
+from mis_2025_tasks.utils.known_ids import KnownIds
+from mis_2025_tasks.utils.metrics import TaskMetrics
+from mis_2025_tasks.utils.rate_control import AimdLimit, is_congestion
+
+def _full_resync_due(kwargs, last_full_sync_at, full_resync_days):
+    """
+    A full walk from the start of the list is done when asked for through
+    the `full_resync` DAG param, or when the last one is older than
+    FULL_RESYNC_DAYS (0 disables the periodic walk).
+    """
+    params = kwargs.get("params") or {}
+    if params.get("full_resync"):
+        return True
+    if last_full_sync_at is None:
+        return True
+    if full_resync_days <= 0:
+        return False
+    return datetime.now(timezone.utc) - last_full_sync_at >= timedelta(days=full_resync_days)
+
+
+def _get_page(session, url, params, breaker, page_size, metrics, deadline=None):
+    """
+    Fetches one submissionList page, retrying congestion errors (outages
+    and 429s) with a growing backoff until the circuit breaker trips or
+    the `deadline` (time.monotonic()) passes.
+
+    numEntries is taken from `page_size` on every attempt, and each
+    response's time per entry is fed back to it, so a retry after a
+    congestion error asks for a smaller page.
+    """
+    retries = 0
+    while True:
+        params["numEntries"] = page_size.value
+        started = time.monotonic()
+        try:
+            response = session.get(url, params=params, headers={"Accept": "application/xml"}, timeout=90)
+            response.raise_for_status()
+        except Exception as e:
+            breaker.record(e)
+            page_size.observe(error=e)
+            if not is_congestion(e):
+                raise
+            if breaker.is_open:
+                raise AirflowFailException(f"ODK Aggregate looks down, list sync of {params['formId']} stopped: {e}")
+            # 429s don't count towards the breaker; the deadline bounds them
+            if deadline is not None and time.monotonic() > deadline:
+                raise
+            retries += 1
+            time.sleep(min(2 ** retries, 30))
+            continue
+        breaker.record()
+        elapsed = time.monotonic() - started
+        page_size.observe(elapsed / params["numEntries"])
+        metrics.timing("download_seconds", elapsed)
+        metrics.size("response_bytes", len(response.content))
+        return response
+
 
 def fetch_odk_submission_list(**kwargs):
     """
-    Generic function to fetch submission IDs for any ODK form 
-    and UPSERT them into a specific tracking table.
+    Pages through a form's submissionList from the cursor saved in
+    odk_sync_state (from the start on a full resync) and inserts the IDs
+    not seen before into the form's tracking table.
     """
     # Parameters from op_kwargs
     form_id = kwargs["form_id"]
@@ -18,60 +80,158 @@ def fetch_odk_submission_list(**kwargs):
     password = kwargs["AGG_PASSWORD"]
     postgres_conn_id = kwargs["POSTGRES_CONN_ID"]
     num_entries = int(kwargs.get("NUM_ENTRIES", 100))
+    max_num_entries = max(num_entries, int(kwargs.get("MAX_NUM_ENTRIES", 1000)))
+    full_resync_days = float(kwargs.get("FULL_RESYNC_DAYS", 7))
+    deadline = task_deadline(kwargs)
 
-    session = requests.Session()
-    session.auth = HTTPDigestAuth(username, password)
+    # Set by utils/streaming.py when content is ingested while listing
+    on_new_ids = kwargs.get("on_new_ids")
+    should_stop = kwargs.get("should_stop")
+    claim_for = kwargs.get("claim_for")
+    claim_lease = int(kwargs.get("CLAIM_LEASE_MINUTES", 120))
+    known_id_filter = str(kwargs.get("KNOWN_ID_FILTER", True)).lower() in ("1", "true", "yes")
+
+    session = make_session(username, password)
+    breaker = CircuitBreaker(kwargs.get("BREAKER_THRESHOLD", 5))
+    # One decision per page, growing by a quarter of the starting size
+    page_size = AimdLimit(
+        f"{form_id} numEntries", num_entries, minimum=min(10, num_entries), maximum=max_num_entries,
+        step=max(1, num_entries // 4), rounds_of=1,
+    )
     pg = PostgresHook(postgres_conn_id=postgres_conn_id)
+    metrics = TaskMetrics("list", form_id, textfile_dir=kwargs.get("METRICS_TEXTFILE_DIR") or None)
 
-    cursor_val = ""
     total_checked = 0
+    total_new = 0
 
     with pg.get_conn() as conn:
         with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT resumption_cursor, last_full_sync_at, full_walk_started_at FROM odk_sync_state "
+                "WHERE form_id = %s",
+                (form_id,),
+            )
+            saved_cursor, last_full_sync_at, walk_started_at = cursor.fetchone() or (None, None, None)
+
+            if walk_started_at is not None:
+                # An earlier full walk stopped part way (deadline, breaker,
+                # failure): carry on from the cursor it saved
+                full_resync = True
+                cursor_val = saved_cursor or ""
+                print(f"Resuming the full resync of {form_id} started at {walk_started_at:%Y-%m-%d %H:%M}.")
+            else:
+                full_resync = _full_resync_due(kwargs, last_full_sync_at, full_resync_days)
+                cursor_val = "" if full_resync else (saved_cursor or "")
+                if full_resync:
+                    cursor.execute("""
+                        INSERT INTO odk_sync_state (form_id, resumption_cursor, full_walk_started_at, updated_at)
+                        VALUES (%s, NULL, now(), now())
+                        ON CONFLICT (form_id) DO UPDATE
+                        SET resumption_cursor = NULL, full_walk_started_at = now(), updated_at = now();
+                    """, (form_id,))
+                    conn.commit()
+                print(f"{'Full resync' if full_resync else 'Incremental sync'} of {form_id} "
+                      f"{'from a saved cursor' if cursor_val else 'from the start'}.")
+
+            # A full walk mostly sees IDs we already have; skip sending
+            # those to Postgres. Incremental walks see mostly new ones, so
+            # the table scan isn't worth it there.
+            known = None
+            if known_id_filter and full_resync:
+                with metrics.timer("known_ids_load_seconds"):
+                    known = KnownIds.load(conn, target_table)
+                print(f"Loaded {len(known)} known {form_id} IDs ({len(known) * 8 / 1048576:.1f} MB).")
+
+            save_cursor_sql = """
+                INSERT INTO odk_sync_state (form_id, resumption_cursor, updated_at)
+                VALUES (%s, %s, now())
+                ON CONFLICT (form_id) DO UPDATE
+                SET resumption_cursor = EXCLUDED.resumption_cursor, updated_at = now();
+            """
+
+            # Each page's IDs are committed with its cursor, so stopping early
+            # keeps everything synced so far
+            completed = False
             while True:
+                if time.monotonic() > deadline:
+                    print(f"Deadline reached; {form_id} list sync resumes from the saved cursor next run.")
+                    break
+                if should_stop is not None and should_stop():
+                    print(f"Stopped; {form_id} list sync resumes from the saved cursor next run.")
+                    break
+
                 #url = f"{aggregate_url}/view/submissionList?formId={form_id}&numEntries={num_entries}&cursor={cursor_val}"
                 
                 #response = session.get(url, headers={"Accept": "application/xml"})
                 url = f"{aggregate_url}/view/submissionList"
 
-                params = {
-                    "formId": form_id,
-                    "numEntries": num_entries,
-                }
+                params = {"formId": form_id}
                 
                 if cursor_val:
                     params["cursor"] = cursor_val
                 
-                response = session.get(
-                    url,
-                    params=params,
-                    headers={"Accept": "application/xml"},
-                )
-                response.raise_for_status()
-                root = ET.fromstring(response.text)
+                response = _get_page(session, url, params, breaker, page_size, metrics, deadline)
+                with metrics.timer("parse_seconds"):
+                    root = ET.fromstring(response.text)
 
-                ns = {"odk": "http://opendatakit.org/submissions"}
-                ids = [el.text for el in root.findall(".//odk:idList/odk:id", ns)]
+                    ns = {"odk": "http://opendatakit.org/submissions"}
+                    ids = [el.text for el in root.findall(".//odk:idList/odk:id", ns)]
 
                 if not ids:
+                    completed = True
                     break
 
-                # Dynamic table name and safe UPSERT logic
+                # Whole page in one statement, returning the IDs that are new.
+                # When streaming they are inserted already claimed by the
+                # consuming content task.
                 upsert_sql = f"""
-                    INSERT INTO {target_table} (id, status)
-                    VALUES (%s, NULL)
-                    ON CONFLICT (id) DO NOTHING;
+                    INSERT INTO {target_table} (id, status, claimed_by, claimed_until)
+                    SELECT unnest(%s::text[]), NULL, %s, now() + %s * interval '1 minute'
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING id;
                 """
-                
-                for id_val in ids:
-                    cursor.execute(upsert_sql, (id_val,))
-                
-                conn.commit()
+                unseen = ids if known is None else [i for i in ids if i not in known]
+                metrics.incr("filtered", len(ids) - len(unseen))
+                written = time.monotonic()
+                new_ids = []
+                if unseen:
+                    cursor.execute(upsert_sql, (unseen, claim_for, claim_lease if claim_for else None))
+                    new_ids = [row[0] for row in cursor.fetchall()]
                 total_checked += len(ids)
+                total_new += len(new_ids)
 
+                # The cursor is saved in the same transaction as the page's IDs,
+                # so a crash never skips past IDs that were not stored.
                 cursor_el = root.find(".//odk:resumptionCursor", ns)
-                if cursor_el is None or cursor_el.text is None:
+                has_next = cursor_el is not None and cursor_el.text is not None
+                if has_next:
+                    cursor.execute(save_cursor_sql, (form_id, cursor_el.text))
+                conn.commit()
+                metrics.timing("db_write_seconds", time.monotonic() - written)
+                if on_new_ids is not None and new_ids:
+                    on_new_ids(new_ids)
+
+                if not has_next:
+                    completed = True
                     break
                 cursor_val = cursor_el.text
 
-    print(f"Sync complete for {form_id}. Checked {total_checked} IDs in {target_table}.")
+            if full_resync and completed:
+                cursor.execute("""
+                    INSERT INTO odk_sync_state (form_id, last_full_sync_at)
+                    VALUES (%s, now())
+                    ON CONFLICT (form_id) DO UPDATE SET last_full_sync_at = now(), full_walk_started_at = NULL;
+                """, (form_id,))
+                conn.commit()
+
+    total_known = total_checked - total_new
+    print(
+        f"Sync complete for {form_id}. Checked {total_checked} IDs in {target_table}: "
+        f"{total_new} new, {total_known} already known."
+    )
+    metrics.incr("new", total_new)
+    metrics.incr("known", total_known)
+    return {
+        "form_id": form_id, "checked": total_checked, "new": total_new, "known": total_known,
+        "metrics": metrics.finish(),
+    }
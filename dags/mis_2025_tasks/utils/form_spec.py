@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+try:
+    from lxml import etree as ET
+    _PARSER = ET.XMLParser(resolve_entities=False, no_network=True)
+except ImportError:  # lxml is optional, the stdlib parser gives the same results
+    import xml.etree.ElementTree as ET
+    _PARSER = None
+
+NAMESPACES = {
+    'odk': 'http://opendatakit.org/submissions',
+    'orx': 'http://openrosa.org/xforms',
+    'default': 'http://opendatakit.org/submissions'
+}
+
+GPS_COLUMNS = ("latitude", "longitude", "altitude", "accuracy")
+
+
+@dataclass(frozen=True)
+class Field:
+    """
+    One XML value mapped to one or more table columns.
+
+    `source` says where the raw value lives: "data" for a child of the
+    form's <data> block, "meta" for a child of its orx:meta block and
+    "attr" for an attribute of the <data> block itself. `convert` turns
+    the raw string (or None) into the column value, or into a tuple of
+    values when the field fills several columns. `sql_type` is the type
+    its columns get when utils/schema.py creates them.
+    """
+    columns: tuple
+    tag: str
+    convert: object
+    source: str = "data"
+    sql_type: str = "TEXT"
+
+
+@dataclass(frozen=True)
+class FormSpec:
+    """
+    Everything the generic content engine needs to ingest one ODK form.
+    """
+    name: str
+    form_id: str
+    target_table: str
+    ids_table: str
+    fields: tuple
+    key_column: str = "instanceid"
+    # Fall back to the first inner <data> block when its id attribute differs
+    any_data_block: bool = False
+    # Queue table that receives `dedup_key` of every upserted row, for
+    # forms deduplicated incrementally after ingestion
+    dedup_queue: str = None
+    dedup_key: str = None
+
+    @property
+    def columns(self):
+        """Every column the form's records carry, in field order."""
+        return tuple(column for field in self.fields for column in field.columns)
+
+    @property
+    def gps_fields(self):
+        """The form's gps() fields."""
+        return tuple(field for field in self.fields if field.convert is _as_gps)
+
+
+def _as_text(raw):
+    return raw
+
+
+def _as_int(default):
+    return lambda raw: int(raw) if raw else default
+
+
+def _as_float(default):
+    return lambda raw: float(raw) if raw else default
+
+
+def _as_gps(raw):
+    # ODK GPS strings are "lat lon alt acc"; keep whatever parses, in order
+    values = [None] * len(GPS_COLUMNS)
+    if raw:
+        try:
+            for i, part in enumerate(raw.split()[:len(GPS_COLUMNS)]):
+                values[i] = float(part)
+        except ValueError:
+            pass
+    return tuple(values)
+
+
+def text(column, tag=None):
+    return Field((column,), tag or column, _as_text)
+
+
+def integer(column, tag=None, default=None):
+    return Field((column,), tag or column, _as_int(default), sql_type="INTEGER")
+
+
+def decimal(column, tag=None, default=None):
+    return Field((column,), tag or column, _as_float(default), sql_type="DOUBLE PRECISION")
+
+
+def gps(tag, columns=GPS_COLUMNS):
+    return Field(tuple(columns), tag, _as_gps, sql_type="DOUBLE PRECISION")
+
+
+def meta(column, tag=None):
+    return Field((column,), tag or column, _as_text, source="meta")
+
+
+def instance_id(column="instanceid"):
+    return Field((column,), "instanceID", _as_text, source="attr")
+
+
+def find_data_block(spec, root):
+    data_el = root.find(f".//default:data/default:data[@id='{spec.form_id}']", NAMESPACES)
+    if data_el is None and spec.any_data_block:
+        data_el = root.find(".//default:data/default:data", NAMESPACES)
+    return data_el
+
+
+@lru_cache(maxsize=None)
+def _compile(spec):
+    """
+    Precomputes, once per form, the Clark-notation tag each field is read
+    from, so a submission can be read in a single pass over its children.
+    """
+    odk, orx = NAMESPACES["default"], NAMESPACES["orx"]
+    plan = []
+    for field in spec.fields:
+        if field.source == "attr":
+            key = field.tag
+        elif field.source == "meta":
+            key = f"{{{orx}}}{field.tag}"
+        else:
+            key = f"{{{odk}}}{field.tag}"
+        single = field.columns[0] if len(field.columns) == 1 else None
+        plan.append((field.source, key, single, field.columns, field.convert))
+    return f"{{{orx}}}meta", tuple(plan)
+
+
+def parse_submission(spec, content, submission_id):
+    """
+    Parses one downloadSubmission response into a record dict keyed by
+    column name, following the form's field list.
+
+    The <data> block is walked once; the first occurrence of each tag wins,
+    as it did with per-field find() lookups.
+    """
+    root = ET.fromstring(content, _PARSER) if _PARSER is not None else ET.fromstring(content)
+    data_el = find_data_block(spec, root)
+    if data_el is None:
+        raise ValueError(f"Could not find {spec.form_id} data block for {submission_id}")
+
+    meta_tag, plan = _compile(spec)
+
+    values = {}
+    meta_values = {}
+    seen_meta = False
+    for child in data_el:
+        tag = child.tag
+        if tag == meta_tag:
+            if not seen_meta:
+                seen_meta = True
+                for meta_child in child:
+                    meta_values.setdefault(meta_child.tag, meta_child.text)
+        elif tag not in values:
+            values[tag] = child.text
+
+    record = {}
+    for source, key, single, columns, convert in plan:
+        if source == "attr":
+            raw = data_el.get(key)
+        elif source == "meta":
+            raw = meta_values.get(key)
+        else:
+            raw = values.get(key)
+            raw = raw.strip() if raw else None
+
+        if single is not None:
+            record[single] = convert(raw)
+        else:
+            record.update(zip(columns, convert(raw)))
+    return record
@@ -0,0 +1,163 @@
+import hashlib
+import json
+
+from airflow.exceptions import AirflowFailException, AirflowSkipException
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+from psycopg2.extras import execute_values
+
+from mis_2025_tasks.forms import FORMS
+from mis_2025_tasks.utils.metrics import TaskMetrics
+
+# EA polygons loaded from EA_BOUNDARIES_PATH, replaced whenever the file
+# changes. Created by ensure_schema when PostGIS is installed.
+BOUNDARIES_SQL = """
+    CREATE TABLE IF NOT EXISTS ea_boundaries (
+        ea TEXT PRIMARY KEY,
+        properties JSONB,
+        geom geometry(MultiPolygon, 4326) NOT NULL,
+        source_sha256 TEXT NOT NULL,
+        loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+"""
+BOUNDARIES_INDEXES = {
+    "ea_boundaries_geom_idx": "CREATE INDEX ea_boundaries_geom_idx ON ea_boundaries USING gist (geom)",
+}
+
+
+def geo_columns(field):
+    """Geometry, assigned EA and assignment time columns of a gps() field."""
+    return f"{field.tag}_geom", f"{field.tag}_ea", f"{field.tag}_ea_assigned_at"
+
+
+def geo_schema(spec):
+    """
+    Column definitions and {name: CREATE INDEX} statements adding a point
+    geometry per GPS field to a form table, for databases with PostGIS.
+
+    The geometry is a stored generated column, so every batch upsert fills
+    it in the same statement and adding it backfills existing rows. It gets
+    a GiST index, next to the columns assign_eas() fills.
+    """
+    columns, indexes = [], {}
+    for field in spec.gps_fields:
+        latitude, longitude = field.columns[:2]
+        geom, ea, assigned_at = geo_columns(field)
+        columns += [
+            f"{geom} geometry(Point, 4326) "
+            f"GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint({longitude}, {latitude}), 4326)) STORED",
+            f"{ea} TEXT",
+            f"{assigned_at} TIMESTAMPTZ",
+        ]
+        for name, using in ((f"{spec.target_table}_{geom}_idx", f"USING gist ({geom})"),
+                            (f"{spec.target_table}_{assigned_at}_idx", f"({assigned_at})")):
+            indexes[name] = f"CREATE INDEX {name} ON {spec.target_table} {using}"
+    return columns, indexes
+
+
+def load_ea_boundaries(conn, path, id_property):
+    """
+    Replaces ea_boundaries with the features of the GeoJSON file at `path`
+    (WGS84), unless it already holds this version of the file. Each
+    feature's `id_property` is its EA code. Returns when the boundaries in
+    the table were loaded.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    sha256 = hashlib.sha256(content).hexdigest()
+
+    with conn.cursor() as cursor:
+        # Forms are assigned in parallel; one of them loads the file
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('ea_boundaries'))")
+        cursor.execute("SELECT source_sha256, max(loaded_at) FROM ea_boundaries GROUP BY source_sha256")
+        loaded = cursor.fetchall()
+        if len(loaded) == 1 and loaded[0][0] == sha256:
+            conn.commit()
+            return loaded[0][1]
+
+        features = json.loads(content)["features"]
+        cursor.execute("DELETE FROM ea_boundaries")
+        execute_values(
+            cursor,
+            "INSERT INTO ea_boundaries (ea, properties, geom, source_sha256) VALUES %s",
+            [
+                (str(feature["properties"][id_property]), json.dumps(feature["properties"]),
+                 json.dumps(feature["geometry"]), sha256)
+                for feature in features
+            ],
+            template="(%s, %s::jsonb, ST_Multi(ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326)), %s)",
+            page_size=500,
+        )
+        cursor.execute("SELECT now()")
+        loaded_at = cursor.fetchone()[0]
+    conn.commit()
+    print(f"Loaded {len(features)} EA boundaries from {path}.")
+    return loaded_at
+
+
+def assign_eas(**kwargs):
+    """
+    Assigns a form's submissions to the EA whose boundary contains their
+    GPS point, into `<gps field>_ea` (NULL when outside every EA or without
+    a location).
+
+    Boundaries come from the GeoJSON file at EA_BOUNDARIES_PATH, keyed by
+    the EA_ID_PROPERTY feature property (default "ea"). Rows never assigned,
+    or assigned before the file last changed, are done EA_ASSIGN_BATCH_SIZE
+    at a time, each batch one UPDATE joined through the boundaries' GiST
+    index. A row whose location changes after it was assigned keeps its EA
+    until the boundaries are reloaded.
+
+    Skipped when EA_BOUNDARIES_PATH is not set; needs PostGIS otherwise.
+    """
+    spec = FORMS[kwargs["form"]]
+    POSTGRES_CONN_ID = kwargs["POSTGRES_CONN_ID"]
+    EA_BOUNDARIES_PATH = kwargs.get("EA_BOUNDARIES_PATH") or ""
+    EA_ID_PROPERTY = kwargs.get("EA_ID_PROPERTY") or "ea"
+    EA_ASSIGN_BATCH_SIZE = int(kwargs.get("EA_ASSIGN_BATCH_SIZE", 5000))
+
+    if not EA_BOUNDARIES_PATH:
+        raise AirflowSkipException("EA_BOUNDARIES_PATH is not set")
+
+    pg = PostgresHook(postgres_conn_id=POSTGRES_CONN_ID)
+    metrics = TaskMetrics("assign_eas", spec.name, textfile_dir=kwargs.get("METRICS_TEXTFILE_DIR") or None)
+    assigned = 0
+
+    with pg.get_conn() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regtype('geometry') IS NOT NULL")
+            if not cursor.fetchone()[0]:
+                raise AirflowFailException("EA_BOUNDARIES_PATH is set but PostGIS is not installed in the database")
+
+        loaded_at = load_ea_boundaries(conn, EA_BOUNDARIES_PATH, EA_ID_PROPERTY)
+
+        for field in spec.gps_fields:
+            geom, ea, assigned_at = geo_columns(field)
+            assign_sql = f"""
+                WITH batch AS (
+                    SELECT {spec.key_column} FROM {spec.target_table}
+                    WHERE {assigned_at} IS NULL OR {assigned_at} < %(loaded_at)s
+                    LIMIT %(limit)s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE {spec.target_table} AS t
+                SET {ea} = (
+                        SELECT b.ea FROM ea_boundaries b
+                        WHERE ST_Covers(b.geom, t.{geom})
+                        ORDER BY b.ea LIMIT 1
+                    ),
+                    {assigned_at} = now()
+                FROM batch
+                WHERE t.{spec.key_column} = batch.{spec.key_column}
+            """
+            while True:
+                with conn.cursor() as cursor, metrics.timer("db_write_seconds"):
+                    cursor.execute(assign_sql, {"loaded_at": loaded_at, "limit": EA_ASSIGN_BATCH_SIZE})
+                    count = cursor.rowcount
+                    conn.commit()
+                if not count:
+                    break
+                assigned += count
+
+    print(f"Assigned EAs to {assigned} {spec.name} submissions.")
+    metrics.incr("assigned", assigned)
+    return {"form": spec.name, "assigned": assigned, "metrics": metrics.finish()}
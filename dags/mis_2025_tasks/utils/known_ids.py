@@ -0,0 +1,46 @@
+import heapq
+from array import array
+from bisect import bisect_left
+
+
+class KnownIds:
+    """
+    Compact, read-only set of the IDs in a tracking table.
+
+    Holds one sorted 64-bit hash per ID (8 bytes each, so a million IDs
+    take 8 MB) and answers `id in known` by binary search. Hashes are
+    Python's own str hash, so a set is only valid in the process that
+    built it. A collision could make a new ID look known; with 64-bit
+    hashes the odds are around 1e-7 for a million-ID table, and such an ID
+    is picked up by the next full resync anyway.
+    """
+
+    def __init__(self, hashes):
+        self._hashes = hashes
+
+    @classmethod
+    def load(cls, conn, table, chunk_size=50000):
+        """
+        Streams `table`'s IDs through a server-side cursor. Each chunk is
+        hashed and sorted on its own and the chunks are merged, so loading
+        never needs much more than the final array.
+        """
+        chunks = []
+        with conn.cursor(name=f"known_{table}") as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute(f"SELECT id FROM {table}")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                chunks.append(array("q", sorted(hash(row[0]) for row in rows)))
+        conn.commit()
+        return cls(array("q", heapq.merge(*chunks)))
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, submission_id):
+        h = hash(submission_id)
+        i = bisect_left(self._hashes, h)
+        return i < len(self._hashes) and self._hashes[i] == h
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from airflow.stats import Stats
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Fixed-bucket histogram, Prometheus style (`le` upper bounds)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation, capped at the max."""
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class TaskMetrics:
+    """
+    Per-task hot-path metrics for one form.
+
+    Timings (seconds) and sizes (bytes) go into histograms, and counts into
+    counters. Each observation is also sent through Airflow's StatsD client
+    as `mis_2025.<task>.<form>.<name>`; that call does nothing unless
+    [metrics] statsd_on is set. With `textfile_dir` set, finish() also
+    writes the histograms for node_exporter's textfile collector.
+
+    Download threads report into the same object, so updates are locked.
+    """
+
+    def __init__(self, task, form, shard=None, textfile_dir=None):
+        self.task = task
+        self.form = form
+        self.shard = shard
+        self.textfile_dir = textfile_dir
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _stat(self, name):
+        return f"mis_2025.{self.task}.{self.form}.{name}"
+
+    def timing(self, name, seconds):
+        with self._lock:
+            self.histograms.setdefault(name, Histogram(SECONDS_BUCKETS)).observe(seconds)
+        Stats.timing(self._stat(name), seconds * 1000)
+
+    def size(self, name, nbytes):
+        with self._lock:
+            self.histograms.setdefault(name, Histogram(BYTES_BUCKETS)).observe(nbytes)
+        Stats.incr(self._stat(name), count=nbytes)
+
+    def incr(self, name, count=1):
+        if not count:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+        Stats.incr(self._stat(name), count=count)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timing(name, time.monotonic() - started)
+
+    def summary(self):
+        """Compact, JSON-serialisable summary for the log and XCom."""
+        out = {name: count for name, count in sorted(self.counters.items())}
+        for name, h in sorted(self.histograms.items()):
+            if name.endswith("_bytes"):
+                out[name] = {"count": h.count, "total": int(h.sum), "max": int(h.max)}
+            else:
+                out[name] = {
+                    "count": h.count,
+                    "total_s": round(h.sum, 3),
+                    "p50_ms": round(h.quantile(0.5) * 1000),
+                    "p95_ms": round(h.quantile(0.95) * 1000),
+                    "max_ms": round(h.max * 1000),
+                }
+        return out
+
+    def finish(self):
+        """Prints the summary, writes the textfile if configured and returns the summary."""
+        summary = self.summary()
+        parts = []
+        for name, value in summary.items():
+            if not isinstance(value, dict):
+                parts.append(f"{name}={value}")
+            elif "total_s" in value:
+                parts.append(f"{name} {value['count']}× {value['total_s']}s (p95 {value['p95_ms']}ms)")
+            else:
+                parts.append(f"{name} {value['total'] / 1048576:.1f}MB")
+        print(f"{self.form} {self.task} metrics: " + ", ".join(parts))
+        if self.textfile_dir:
+            self._write_textfile()
+        return summary
+
+    def _write_textfile(self):
+        labels = f'form="{self.form}",task="{self.task}"'
+        if self.shard is not None:
+            labels += f',shard="{self.shard}"'
+        lines = []
+        for name, count in sorted(self.counters.items()):
+            lines.append(f"mis_2025_{name}_total{{{labels}}} {count}")
+        for name, h in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, n in zip(h.buckets, h.counts):
+                cumulative += n
+                lines.append(f'mis_2025_{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'mis_2025_{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f"mis_2025_{name}_sum{{{labels}}} {h.sum}")
+            lines.append(f"mis_2025_{name}_count{{{labels}}} {h.count}")
+
+        suffix = f"_{self.shard}" if self.shard is not None else ""
+        path = os.path.join(self.textfile_dir, f"mis_2025_{self.task}_{self.form}{suffix}.prom")
+        # Written then renamed, so the collector never reads half a file
+        with open(path + ".tmp", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,134 @@
+import glob
+import os
+from datetime import timezone
+
+from airflow.exceptions import AirflowFailException, AirflowSkipException
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+
+from mis_2025_tasks.forms import FORMS
+from mis_2025_tasks.utils.metrics import TaskMetrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed when PARQUET_EXPORT_DIR is set
+    pa = pq = None
+
+
+def _arrow_schema(spec):
+    types = {"TEXT": pa.string(), "INTEGER": pa.int32(), "DOUBLE PRECISION": pa.float64()}
+    columns = [(column.lower(), types[field.sql_type]) for field in spec.fields for column in field.columns]
+    return pa.schema(columns + [("ingested_at", pa.timestamp("us", tz="UTC"))])
+
+
+def _write_chunk(export_dir, spec, schema, rows, run_tag, chunk_no):
+    """
+    Writes one chunk of rows (ingested_at last) as one Parquet file per
+    ingest date it spans. Returns the paths written.
+    """
+    by_date = {}
+    for row in rows:
+        by_date.setdefault(row[-1].astimezone(timezone.utc).date(), []).append(row)
+
+    paths = []
+    for day, day_rows in by_date.items():
+        directory = os.path.join(export_dir, f"form={spec.name}", f"ingest_date={day.isoformat()}")
+        os.makedirs(directory, exist_ok=True)
+        table = pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*day_rows), schema)], schema=schema,
+        )
+        # Written aside and renamed, so readers never see a partial file
+        path = os.path.join(directory, f"part-{run_tag}-{chunk_no:05d}.parquet")
+        pq.write_table(table, path + ".tmp", compression="zstd")
+        os.replace(path + ".tmp", path)
+        paths.append(path)
+    return paths
+
+
+def export_form_parquet(**kwargs):
+    """
+    Appends a form's newly ingested rows to Parquet files under
+    PARQUET_EXPORT_DIR, partitioned Hive-style by form and ingest date
+    (`form=census/ingest_date=2025-03-01/part-*.parquet`), so analytical
+    scans can read compressed columnar files instead of the form tables.
+
+    Rows are picked by `ingested_at` from the watermark saved by the
+    previous export in parquet_export_state. The export stops short of the
+    oldest transaction still open, whose rows may not be visible yet, and
+    saves that as the next watermark. Files are named after the watermark
+    they start from; those left by an export that died before saving it
+    are removed first, so the rows are redone rather than duplicated.
+
+    Skipped when PARQUET_EXPORT_DIR is not set; needs pyarrow otherwise.
+    Rows are only ever appended: later updates to an exported row, and
+    rows removed by census deduplication, are not reflected.
+    """
+    spec = FORMS[kwargs["form"]]
+    POSTGRES_CONN_ID = kwargs["POSTGRES_CONN_ID"]
+    PARQUET_EXPORT_DIR = kwargs.get("PARQUET_EXPORT_DIR") or ""
+    PARQUET_CHUNK_ROWS = int(kwargs.get("PARQUET_CHUNK_ROWS", 100000))
+
+    if not PARQUET_EXPORT_DIR:
+        raise AirflowSkipException("PARQUET_EXPORT_DIR is not set")
+    if pa is None:
+        raise AirflowFailException("PARQUET_EXPORT_DIR is set but pyarrow is not installed")
+
+    pg = PostgresHook(postgres_conn_id=POSTGRES_CONN_ID)
+    metrics = TaskMetrics("export", spec.name, textfile_dir=kwargs.get("METRICS_TEXTFILE_DIR") or None)
+    schema = _arrow_schema(spec)
+    exported = 0
+    files = 0
+
+    with pg.get_conn() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT exported_until FROM parquet_export_state WHERE form_id = %s", (spec.form_id,))
+            since = (cursor.fetchone() or (None,))[0]
+            # ingested_at is its transaction's start time, so rows of a
+            # transaction still open can't be older than its xact_start
+            cursor.execute("""
+                SELECT least(now(), min(xact_start)) FROM pg_stat_activity
+                WHERE datname = current_database()
+            """)
+            until = cursor.fetchone()[0]
+
+        run_tag = since.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%S%f") if since else "initial"
+        for stale in glob.glob(os.path.join(
+            PARQUET_EXPORT_DIR, f"form={spec.name}", "ingest_date=*", f"part-{run_tag}-*",
+        )):
+            os.remove(stale)
+        print(f"Exporting {spec.name} rows ingested from {since or 'the start'} until {until}.")
+
+        with conn.cursor(name=f"export_{spec.name}") as rows:
+            rows.itersize = PARQUET_CHUNK_ROWS
+            rows.execute(f"""
+                SELECT {', '.join(field.name for field in schema)} FROM {spec.target_table}
+                WHERE (%(since)s::timestamptz IS NULL OR ingested_at >= %(since)s) AND ingested_at < %(until)s
+                ORDER BY ingested_at, {spec.key_column}
+            """, {"since": since, "until": until})
+
+            chunk_no = 0
+            while True:
+                with metrics.timer("db_read_seconds"):
+                    chunk = rows.fetchmany(PARQUET_CHUNK_ROWS)
+                if not chunk:
+                    break
+                with metrics.timer("write_seconds"):
+                    files += len(_write_chunk(PARQUET_EXPORT_DIR, spec, schema, chunk, run_tag, chunk_no))
+                exported += len(chunk)
+                chunk_no += 1
+
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO parquet_export_state (form_id, exported_until, updated_at)
+                VALUES (%s, %s, now())
+                ON CONFLICT (form_id) DO UPDATE
+                SET exported_until = EXCLUDED.exported_until, updated_at = now();
+            """, (spec.form_id, until))
+        conn.commit()
+
+    print(f"Exported {exported} {spec.name} rows to {files} Parquet files under {PARQUET_EXPORT_DIR}.")
+    metrics.incr("rows", exported)
+    return {
+        "form": spec.name, "rows": exported, "files": files, "exported_until": until.isoformat(),
+        "metrics": metrics.finish(),
+    }
@@ -0,0 +1,125 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import re
+import socket
+import sys
+import threading
+from collections import Counter
+from fnmatch import fnmatch
+
+from airflow.configuration import conf
+
+
+class StackSampler:
+    """
+    Samples every thread's stack each `interval` seconds from a background
+    thread and counts them in collapsed form ("thread;outer;...;inner"), the
+    input of flamegraph.pl, speedscope and similar. Unlike cProfile it sees
+    the download worker threads too, and time spent waiting.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            # Pool workers differ only by a numeric suffix; fold them together
+            names = {t.ident: re.sub(r"_\d+$", "", t.name) for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _profiling_requested(kwargs):
+    """
+    On for every task of a run triggered with {"profile": true}, or for the
+    tasks matching PROFILE_TASKS (comma-separated task_id patterns, e.g.
+    "census_*,household_content").
+    """
+    params = kwargs.get("params") or {}
+    if params.get("profile"):
+        return True
+    patterns = [p.strip() for p in str(kwargs.get("PROFILE_TASKS") or "").split(",") if p.strip()]
+    if not patterns:
+        return False
+    ti = kwargs.get("ti")
+    task_id = ti.task_id if ti is not None else ""
+    return any(fnmatch(task_id, pattern) for pattern in patterns)
+
+
+def _profile_dir(kwargs):
+    """logs/profiles/, laid out like the task logs: one directory per task try."""
+    base = conf.get("logging", "base_log_folder")
+    ti = kwargs.get("ti")
+    if ti is None:
+        return os.path.join(base, "profiles", f"{socket.gethostname()}-{os.getpid()}")
+    parts = [f"dag_id={ti.dag_id}", f"run_id={ti.run_id}", f"task_id={ti.task_id}"]
+    if ti.map_index is not None and ti.map_index >= 0:
+        parts.append(f"map_index={ti.map_index}")
+    parts.append(f"attempt={ti.try_number}")
+    return os.path.join(base, "profiles", *parts)
+
+
+def profiled(task_callable):
+    """
+    Wraps a task callable so it can be profiled when asked for (see
+    _profiling_requested); otherwise it is called straight through.
+
+    A profiled run writes, under
+    logs/profiles/dag_id=…/run_id=…/task_id=…[/map_index=…]/attempt=…/:
+    `profile.pstats` (cProfile of the task's main thread, for pstats or
+    snakeviz), `profile.collapsed` (stack samples of every thread every
+    PROFILE_INTERVAL_MS, default 10, for a flamegraph) and logs the top
+    functions by cumulative time. Files are written even if the task fails.
+    """
+    @functools.wraps(task_callable)
+    def wrapper(**kwargs):
+        if not _profiling_requested(kwargs):
+            return task_callable(**kwargs)
+
+        directory = _profile_dir(kwargs)
+        profiler = cProfile.Profile()
+        sampler = StackSampler(float(kwargs.get("PROFILE_INTERVAL_MS", 10)) / 1000)
+        sampler.start()
+        profiler.enable()
+        try:
+            return task_callable(**kwargs)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            os.makedirs(directory, exist_ok=True)
+            profiler.dump_stats(os.path.join(directory, "profile.pstats"))
+            sampler.write(os.path.join(directory, "profile.collapsed"))
+
+            top = io.StringIO()
+            pstats.Stats(profiler, stream=top).sort_stats("cumulative").print_stats(25)
+            print(top.getvalue())
+            print(f"Profile written to {directory} ({sum(sampler.stacks.values())} stack samples).")
+
+    return wrapper
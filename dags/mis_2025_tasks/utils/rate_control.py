@@ -0,0 +1,91 @@
+import threading
+
+import requests
+
+from mis_2025_tasks.utils.circuit_breaker import is_outage_error
+
+
+def is_congestion(error):
+    """
+    True for errors that mean Aggregate wants less pressure: timeouts,
+    dropped connections, 5xx and 429.
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        if error.response.status_code == 429:
+            return True
+    return is_outage_error(error)
+
+
+class AimdLimit:
+    """
+    Additive-increase / multiplicative-decrease limit on request pressure.
+
+    `value` starts at `start` and stays within [minimum, maximum]. Every
+    response is reported through `observe(latency, error)`. A congestion
+    error, or smoothed latency above `latency_tolerance` times the best
+    latency seen, halves the value. A full round of healthy responses
+    (`value` of them, or `rounds_of` when given) adds `step`.
+
+    After a decrease, further signals are ignored for one round, since the
+    responses still arriving were sent under the old limit. The latency
+    baseline drifts up slowly so a server that is just slower today does
+    not ratchet the limit down to the floor.
+
+    Shared by the download threads of a task, so updates happen under a lock.
+    """
+
+    def __init__(self, name, start, minimum=1, maximum=None, step=1, rounds_of=None,
+                 latency_tolerance=2.0, decrease_factor=0.5):
+        self.name = name
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum if maximum is not None else start))
+        self.value = min(max(int(start), self.minimum), self.maximum)
+        self.step = max(1, int(step))
+        self.rounds_of = rounds_of
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self._ewma = None
+        self._baseline = None
+        self._healthy = 0
+        self._cooldown = 0
+        self._lock = threading.Lock()
+
+    def _round(self):
+        return self.rounds_of or self.value
+
+    def _set(self, value, reason):
+        value = min(max(int(value), self.minimum), self.maximum)
+        if value != self.value:
+            print(f"{self.name}: {self.value} → {value} ({reason})")
+            self.value = value
+
+    def observe(self, latency=None, error=None):
+        with self._lock:
+            if latency is not None and error is None:
+                self._ewma = latency if self._ewma is None else 0.8 * self._ewma + 0.2 * latency
+                self._baseline = self._ewma if self._baseline is None else min(self._ewma, self._baseline * 1.05)
+
+            if self._cooldown > 0:
+                self._cooldown -= 1
+                return
+
+            if error is not None and is_congestion(error):
+                reason = f"backing off after {error.__class__.__name__}"
+            elif self._ewma is not None and self._ewma > self._baseline * self.latency_tolerance:
+                reason = f"latency {self._ewma:.2f}s against a {self._baseline:.2f}s baseline"
+            else:
+                reason = None
+
+            if reason is not None:
+                self._healthy = 0
+                self._cooldown = self._round()
+                self._set(self.value * self.decrease_factor, reason)
+                return
+
+            if error is not None:
+                # Not Aggregate's fault (e.g. a 404); says nothing about load
+                return
+            self._healthy += 1
+            if self._healthy >= self._round():
+                self._healthy = 0
+                self._set(self.value + self.step, "healthy responses, ramping up")
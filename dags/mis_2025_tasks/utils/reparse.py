@@ -0,0 +1,113 @@
+import gzip
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from airflow.exceptions import AirflowSkipException
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+
+from mis_2025_tasks.forms import FORMS
+from mis_2025_tasks.utils.batch_writer import BatchWriter
+from mis_2025_tasks.utils.content_engine import LOGGED_FAILURES
+from mis_2025_tasks.utils.form_spec import parse_submission
+from mis_2025_tasks.utils.metrics import TaskMetrics
+
+
+def _parse_chunk(form_name, rows):
+    """
+    Runs in a worker process: decompresses and parses one chunk of
+    archived submissions. Returns (instance_id, record, error) tuples.
+    """
+    spec = FORMS[form_name]
+    parsed = []
+    for instance_id, xml_gz in rows:
+        try:
+            parsed.append((instance_id, parse_submission(spec, gzip.decompress(xml_gz), instance_id), None))
+        except Exception as e:
+            parsed.append((instance_id, None, str(e)))
+    return parsed
+
+
+def _parse_chunks(form_name, chunks, processes):
+    """
+    Yields parsed chunks in order, keeping at most `processes * 2` chunks
+    in flight so the archive is streamed rather than loaded whole.
+    """
+    if processes <= 1:
+        for rows in chunks:
+            yield _parse_chunk(form_name, rows)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = deque()
+        for rows in chunks:
+            pending.append(pool.submit(_parse_chunk, form_name, rows))
+            if len(pending) >= processes * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def reparse_form(**kwargs):
+    """
+    Re-derives a form's table from the raw_submissions archive.
+
+    Archived XML is parsed across a process pool (REPARSE_PROCESSES) and
+    bulk-loaded through the usual batch writer, so a mapping change such as
+    a new column needs no downloads from Aggregate. Submissions that parse
+    are marked 'success'; the status of those that still fail is left alone,
+    and no attempts are counted.
+    """
+    spec = FORMS[kwargs["form"]]
+    POSTGRES_CONN_ID = kwargs["POSTGRES_CONN_ID"]
+    WRITE_BATCH_SIZE = int(kwargs.get("WRITE_BATCH_SIZE", 200))
+    REPARSE_PROCESSES = int(kwargs.get("REPARSE_PROCESSES", 4))
+    REPARSE_CHUNK_SIZE = int(kwargs.get("REPARSE_CHUNK_SIZE", 500))
+
+    params = kwargs.get("params") or {}
+    if spec.name not in params.get("forms", list(FORMS)):
+        raise AirflowSkipException(f"{spec.name} not selected for re-parse")
+
+    pg = PostgresHook(postgres_conn_id=POSTGRES_CONN_ID)
+    metrics = TaskMetrics("reparse", spec.name, textfile_dir=kwargs.get("METRICS_TEXTFILE_DIR") or None)
+    failed = 0
+
+    # The archive is read through a server-side cursor on its own connection,
+    # so the writer's commits don't close it.
+    with pg.get_conn() as read_conn, pg.get_conn() as write_conn:
+        with read_conn.cursor(name=f"reparse_{spec.name}") as archive:
+            archive.itersize = REPARSE_CHUNK_SIZE
+            archive.execute(
+                "SELECT instance_id, xml_gz FROM raw_submissions WHERE form_id = %s ORDER BY instance_id",
+                (spec.form_id,),
+            )
+
+            def chunks():
+                while True:
+                    rows = archive.fetchmany(REPARSE_CHUNK_SIZE)
+                    if not rows:
+                        return
+                    # BYTEA arrives as memoryview, which can't be pickled to the workers
+                    yield [(instance_id, bytes(xml_gz)) for instance_id, xml_gz in rows]
+
+            writer = BatchWriter(
+                write_conn, spec.target_table, spec.ids_table, key_column=spec.key_column, batch_size=WRITE_BATCH_SIZE,
+                dedup_queue=spec.dedup_queue, dedup_key=spec.dedup_key, metrics=metrics, columns=spec.columns,
+                record_attempts=False,
+            )
+            for parsed in _parse_chunks(spec.name, chunks(), REPARSE_PROCESSES):
+                for instance_id, record, error in parsed:
+                    if error is not None:
+                        failed += 1
+                        if failed <= LOGGED_FAILURES:
+                            print(f"FAILED {spec.name} {instance_id}: {error}")
+                    else:
+                        writer.add(instance_id, record)
+            writer.flush()
+
+    print(f"{spec.name} re-parse DONE → Loaded: {writer.total_success}, Failed: {failed + writer.total_failed}")
+    metrics.incr("success", writer.total_success)
+    metrics.incr("failed", failed + writer.total_failed)
+    return {
+        "form": spec.name, "loaded": writer.total_success, "failed": failed + writer.total_failed,
+        "metrics": metrics.finish(),
+    }
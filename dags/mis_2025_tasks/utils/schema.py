@@ -0,0 +1,264 @@
+from collections import namedtuple
+
+from airflow.exceptions import AirflowException
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+from psycopg2.errors import LockNotAvailable
+
+from mis_2025_tasks.forms import FORMS
+from mis_2025_tasks.indicators import SUMMARIES
+from mis_2025_tasks.utils.geo import BOUNDARIES_INDEXES, BOUNDARIES_SQL, geo_schema
+from mis_2025_tasks.utils.summary import summary_schema_sql
+
+# One table's managed schema: the statement creating it (None when an
+# earlier step does), the column definitions ("name TYPE ...") it must have,
+# its indexes as {name: CREATE INDEX statement}, and statements run after
+# those that check for themselves whether there is anything to do.
+TableSchema = namedtuple("TableSchema", "table create columns indexes extra")
+
+
+# Bookkeeping tables owned by the pipeline itself.
+SCHEMA_TABLES = [
+    # Last submissionList resumptionCursor per form, so list syncs only
+    # page through submissions made since the previous run. While a full
+    # walk is under way it marks how far that walk got.
+    TableSchema(
+        "odk_sync_state",
+        """
+        CREATE TABLE IF NOT EXISTS odk_sync_state (
+            form_id TEXT PRIMARY KEY,
+            resumption_cursor TEXT,
+            last_full_sync_at TIMESTAMPTZ,
+            full_walk_started_at TIMESTAMPTZ,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        ("full_walk_started_at TIMESTAMPTZ",), {}, (),
+    ),
+    # Every downloaded submission, gzipped, so forms can be re-parsed
+    # without going back to Aggregate (see utils/reparse.py).
+    TableSchema(
+        "raw_submissions",
+        """
+        CREATE TABLE IF NOT EXISTS raw_submissions (
+            form_id TEXT NOT NULL,
+            instance_id TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            xml_gz BYTEA NOT NULL,
+            fetched_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (form_id, instance_id)
+        )
+        """,
+        (), {}, (),
+    ),
+    # How far each form's rows have been exported to Parquet
+    # (see utils/parquet_export.py).
+    TableSchema(
+        "parquet_export_state",
+        """
+        CREATE TABLE IF NOT EXISTS parquet_export_state (
+            form_id TEXT PRIMARY KEY,
+            exported_until TIMESTAMPTZ NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        (), {}, (),
+    ),
+]
+
+
+# Columns of the tracking tables: processing status, shard claims (see
+# utils/shards.py) and retry bookkeeping (see BatchWriter).
+TRACKING_COLUMNS = (
+    "status TEXT",
+    "claimed_by TEXT",
+    "claimed_until TIMESTAMPTZ",
+    "attempts INTEGER NOT NULL DEFAULT 0",
+    "last_error TEXT",
+    "next_attempt_at TIMESTAMPTZ",
+    # When the list sync first saw the ID; newest are processed first
+    "first_seen_at TIMESTAMPTZ NOT NULL DEFAULT now()",
+)
+
+
+def _unique_key_sql(table, column):
+    """
+    ON CONFLICT needs a unique index on the key. Tables created before the
+    schema was managed usually have one under another name, so it is only
+    added when no single-column unique index on `column` exists.
+    """
+    return f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = '{table}'::regclass AND i.indisunique
+              AND i.indnkeyatts = 1 AND i.indpred IS NULL AND a.attname = lower('{column}')
+        ) THEN
+            CREATE UNIQUE INDEX {table}_{column}_key ON {table} ({column});
+        END IF;
+    END
+    $$
+    """
+
+
+def form_schema(spec):
+    """
+    TableSchemas of one form's target and tracking tables: columns the spec
+    gained are added, existing columns are left as they are.
+    """
+    columns = [f"{column} {field.sql_type}" for field in spec.fields for column in field.columns]
+    # When the row was first stored, for incremental exports. Rows that
+    # predate the column get the time it was added.
+    columns.append("ingested_at TIMESTAMPTZ NOT NULL DEFAULT now()")
+    target, ids = spec.target_table, spec.ids_table
+    target_indexes = {f"{target}_ingested_at_idx": f"CREATE INDEX {target}_ingested_at_idx ON {target} (ingested_at)"}
+    target_extra = [_unique_key_sql(target, spec.key_column)]
+    if spec.dedup_queue:
+        # Dedup re-ranks whole dedup_key groups
+        target_indexes[f"{target}_{spec.dedup_key}_idx"] = (
+            f"CREATE INDEX {target}_{spec.dedup_key}_idx ON {target} ({spec.dedup_key})"
+        )
+        # Keys touched by upserts since the last dedup run. Created seeded
+        # with every existing key, so the first incremental run covers the
+        # whole table and later ones only what changed.
+        target_extra.append(f"""
+        DO $$
+        BEGIN
+            IF to_regclass('{spec.dedup_queue}') IS NULL THEN
+                CREATE TABLE {spec.dedup_queue} ({spec.dedup_key} TEXT);
+                INSERT INTO {spec.dedup_queue} SELECT DISTINCT {spec.dedup_key} FROM {target};
+            END IF;
+        END
+        $$
+        """)
+    return [
+        TableSchema(
+            target,
+            f"CREATE TABLE IF NOT EXISTS {target} ({', '.join(columns)}, PRIMARY KEY ({spec.key_column}))",
+            columns, target_indexes, target_extra,
+        ),
+        TableSchema(
+            ids,
+            f"CREATE TABLE IF NOT EXISTS {ids} (id TEXT PRIMARY KEY, {', '.join(TRACKING_COLUMNS)})",
+            TRACKING_COLUMNS,
+            {
+                # Pending IDs are a small share of a large table: index just
+                # those, in claim order (fresh IDs newest first, due retries
+                # by id). The shard count combines the two in a BitmapOr.
+                f"{ids}_fresh_idx": f"CREATE INDEX {ids}_fresh_idx ON {ids} (first_seen_at DESC, id DESC) "
+                                    f"WHERE status IS NULL",
+                f"{ids}_retry_idx": f"CREATE INDEX {ids}_retry_idx ON {ids} (id) WHERE status = 'failed'",
+            },
+            [
+                _unique_key_sql(ids, "id"),
+                # Superseded by the two above
+                f"""
+                DO $$
+                BEGIN
+                    IF to_regclass('{ids}_pending_idx') IS NOT NULL THEN
+                        DROP INDEX {ids}_pending_idx;
+                    END IF;
+                END
+                $$
+                """,
+            ],
+        ),
+    ]
+
+
+def schema_tables(postgis):
+    """Every TableSchema ensure_schema maintains, in the order it applies them."""
+    tables = list(SCHEMA_TABLES)
+    for spec in FORMS.values():
+        tables += form_schema(spec)
+    # Point geometries and EA assignment, when PostGIS is installed
+    if postgis:
+        tables.append(TableSchema("ea_boundaries", BOUNDARIES_SQL, (), BOUNDARIES_INDEXES, ()))
+        for spec in FORMS.values():
+            if spec.gps_fields:
+                tables.append(TableSchema(spec.target_table, None, *geo_schema(spec), ()))
+    for summary in SUMMARIES:
+        tables.append(TableSchema(summary.table, None, (), {}, summary_schema_sql(summary)))
+    return tables
+
+
+def _existing(cursor, table):
+    """Names of the columns and indexes `table` has (both empty if it doesn't exist)."""
+    cursor.execute("""
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+    """, (table,))
+    columns = {row[0] for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = to_regclass(%s)
+    """, (table,))
+    return columns, {row[0] for row in cursor.fetchall()}
+
+
+def _apply(cursor, schema):
+    """
+    Brings one table in line with its TableSchema; returns what was added.
+
+    ALTER TABLE takes an ACCESS EXCLUSIVE lock, and CREATE INDEX a SHARE
+    lock, even when IF NOT EXISTS turns them into no-ops, so existing
+    columns and indexes are looked up in the catalog first and only what is
+    missing is sent.
+    """
+    if schema.create:
+        cursor.execute(schema.create)
+    columns, indexes = _existing(cursor, schema.table)
+    added = []
+    missing = [c for c in schema.columns if c.split()[0].lower() not in columns]
+    if missing:
+        cursor.execute(f"ALTER TABLE {schema.table} {', '.join(f'ADD COLUMN IF NOT EXISTS {c}' for c in missing)}")
+        added += [c.split()[0] for c in missing]
+    for name, statement in schema.indexes.items():
+        if name.lower() not in indexes:
+            cursor.execute(statement)
+            added.append(name)
+    for statement in schema.extra:
+        cursor.execute(statement)
+    return added
+
+
+def ensure_schema(**kwargs):
+    """
+    Creates the pipeline's bookkeeping tables, every form's target and
+    tracking tables, with their indexes, and the indicator summaries if
+    they don't exist yet, and adds columns new to the form specs.
+
+    Each table is committed on its own, and no lock is waited on longer
+    than SCHEMA_LOCK_TIMEOUT_SECONDS: a change stuck behind a long query
+    fails the task (to be retried) instead of queueing every other reader
+    and writer of the table behind it. Indexes are built in the task's
+    transaction, so the first run after an upgrade briefly holds up writes
+    to tables that lacked them.
+    """
+    POSTGRES_CONN_ID = kwargs.get("POSTGRES_CONN_ID", "PG-MIS-2025")
+    SCHEMA_LOCK_TIMEOUT_SECONDS = int(kwargs.get("SCHEMA_LOCK_TIMEOUT_SECONDS", 10))
+    pg = PostgresHook(postgres_conn_id=POSTGRES_CONN_ID)
+    changes = 0
+
+    with pg.get_conn() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT set_config('lock_timeout', %s, false)", (f"{SCHEMA_LOCK_TIMEOUT_SECONDS}s",))
+            cursor.execute("SELECT to_regtype('geometry') IS NOT NULL")
+            postgis = cursor.fetchone()[0]
+
+            for schema in schema_tables(postgis):
+                try:
+                    added = _apply(cursor, schema)
+                    conn.commit()
+                except LockNotAvailable as e:
+                    conn.rollback()
+                    raise AirflowException(
+                        f"Schema changes to {schema.table} timed out waiting for a lock after "
+                        f"{SCHEMA_LOCK_TIMEOUT_SECONDS}s; something holds it open"
+                    ) from e
+                if added:
+                    print(f"{schema.table}: added {', '.join(added)}")
+                    changes += len(added)
+
+    print(f"Schema check complete ({changes} columns or indexes added).")
@@ -0,0 +1,185 @@
+import math
+import os
+import socket
+
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+
+from mis_2025_tasks.forms import FORMS
+from mis_2025_tasks.utils.circuit_breaker import run_seconds_left
+
+# Never attempted, or failed transiently and past its backoff; 'dead' IDs
+# wait for a reset. Claimed IDs belong to another shard until their lease ends.
+UNCLAIMED_SQL = "(claimed_until IS NULL OR claimed_until < now())"
+FRESH_SQL = f"status IS NULL AND {UNCLAIMED_SQL}"
+RETRY_SQL = f"status = 'failed' AND (next_attempt_at IS NULL OR next_attempt_at <= now()) AND {UNCLAIMED_SQL}"
+PENDING_SQL = f"(({FRESH_SQL}) OR ({RETRY_SQL}))"
+
+
+def plan_content_shards(**kwargs):
+    """
+    Splits a form's pending IDs into shards for the mapped content task.
+
+    Returns one {"shard", "size"} dict per mapped task instance. Shards are
+    SHARD_SIZE IDs each, grown when needed so no more than MAX_SHARDS
+    instances are created. An empty list skips the content task.
+
+    Triggering the DAG with {"reset_dead": true} first puts the form's
+    dead-lettered IDs back in the queue. Once the run's RUN_BUDGET_MINUTES
+    are spent no shards are planned; the backlog waits for the next run.
+    """
+    spec = FORMS[kwargs["form"]]
+    POSTGRES_CONN_ID = kwargs["POSTGRES_CONN_ID"]
+    SHARD_SIZE = int(kwargs.get("SHARD_SIZE", 2000))
+    MAX_SHARDS = int(kwargs.get("MAX_SHARDS", 16))
+    params = kwargs.get("params") or {}
+
+    left = run_seconds_left(kwargs)
+    if left is not None and left <= 0:
+        print(f"Run budget spent; no {spec.name} content shards this run.")
+        return []
+
+    pg = PostgresHook(postgres_conn_id=POSTGRES_CONN_ID)
+    with pg.get_conn() as conn:
+        with conn.cursor() as cursor:
+            if params.get("reset_dead"):
+                cursor.execute(f"""
+                    UPDATE {spec.ids_table}
+                    SET status = NULL, attempts = 0, last_error = NULL, next_attempt_at = NULL
+                    WHERE status = 'dead'
+                """)
+                print(f"Reset {cursor.rowcount} dead {spec.name} submissions for another attempt")
+                conn.commit()
+
+            cursor.execute(f"SELECT count(*) FROM {spec.ids_table} WHERE {PENDING_SQL}")
+            pending = cursor.fetchone()[0]
+
+    size = max(SHARD_SIZE, math.ceil(pending / MAX_SHARDS))
+    count = math.ceil(pending / size)
+    print(f"{pending} pending {spec.name} submissions → {count} shards of up to {size}")
+    return [{"shard": i, "size": size} for i in range(count)]
+
+
+def claim_owner(kwargs):
+    ti = kwargs.get("ti")
+    if ti is not None:
+        return f"{ti.dag_id}/{ti.run_id}/{ti.task_id}/{ti.map_index}"
+    return f"{socket.gethostname()}/{os.getpid()}"
+
+
+def claim_pending_ids(conn, spec, owner, limit=None, lease_minutes=120, after=None, retries=False):
+    """
+    Claims up to `limit` pending IDs (all of them when None) for `owner`.
+
+    Never-attempted IDs are claimed newest first (by first_seen_at, then
+    id) and returned as (id, first_seen_at) rows in that order; with
+    `after`, a row from a previous page, only rows ordered after it are
+    considered. With `retries`, due retries are claimed instead, in id
+    order, and `after` is the last id.
+
+    Rows locked by another claimer are skipped, so several shards can drain
+    the same tracking table at once. Claims expire after `lease_minutes`,
+    which frees the IDs of a shard that died without releasing them.
+    """
+    if retries:
+        where, order, key = f"{RETRY_SQL} AND (%(after)s::text IS NULL OR id > %(after)s)", "id", "id"
+    else:
+        where = f"{FRESH_SQL} AND (%(after)s::text IS NULL OR (first_seen_at, id) < (%(after_seen)s, %(after)s))"
+        order, key = "first_seen_at DESC, id DESC", "id, first_seen_at"
+    after_id, after_seen = (after, None) if retries or after is None else after
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            WITH picked AS (
+                SELECT id FROM {spec.ids_table}
+                WHERE {where}
+                ORDER BY {order}
+                LIMIT %(limit)s
+                FOR UPDATE SKIP LOCKED
+            ), claimed AS (
+                UPDATE {spec.ids_table} AS t
+                SET claimed_by = %(owner)s, claimed_until = now() + %(lease)s * interval '1 minute'
+                FROM picked
+                WHERE t.id = picked.id
+                RETURNING t.id, t.first_seen_at
+            )
+            SELECT {key} FROM claimed ORDER BY {order}
+        """, {"owner": owner, "lease": lease_minutes, "limit": limit, "after": after_id, "after_seen": after_seen})
+        rows = cursor.fetchall()
+    conn.commit()
+    return [row[0] for row in rows] if retries else rows
+
+
+class PendingIds:
+    """
+    Iterates over a form's pending IDs, claiming them `page_size` at a time
+    (keyset paged) until `limit` are claimed or none are left.
+
+    Freshness first: never-attempted IDs come first, most recently listed
+    first, so new submissions are in within minutes of a run starting even
+    behind a backlog. Due retries follow, at most `retry_share` of `limit`
+    of them; the rest wait for a later run.
+
+    Only one page is held in memory, so a content task's footprint does not
+    grow with the backlog, and IDs are only claimed once the consumer gets
+    to them: a task that stops early leaves the rest unclaimed. Use a
+    connection of its own, so claims never share a transaction with writes.
+
+    The first page is claimed on construction, so `empty` can be checked
+    before any work starts. `claimed` counts the IDs handed out so far and
+    `retried` how many of them were retries.
+    """
+
+    def __init__(self, conn, spec, owner, limit=None, lease_minutes=120, page_size=1000, retry_share=1.0):
+        self.conn = conn
+        self.spec = spec
+        self.owner = owner
+        self.limit = limit
+        self.lease_minutes = lease_minutes
+        self.page_size = max(1, int(page_size))
+        self.max_retries = None if limit is None else math.ceil(limit * retry_share)
+        self.claimed = 0
+        self.retried = 0
+        self._retries = False
+        self._page = self._claim_page(None)
+
+    @property
+    def empty(self):
+        return not self._page
+
+    def _claim_page(self, after):
+        size = self.page_size if self.limit is None else min(self.page_size, self.limit - self.claimed)
+        if not self._retries:
+            page = []
+            if size > 0:
+                page = claim_pending_ids(self.conn, self.spec, self.owner, size, self.lease_minutes, after=after)
+            if page:
+                self.claimed += len(page)
+                return page
+            # Out of fresh IDs: retries, from the start of their order
+            self._retries, after = True, None
+
+        if self.max_retries is not None:
+            size = min(size, self.max_retries - self.retried)
+        if size <= 0:
+            return []
+        page = claim_pending_ids(self.conn, self.spec, self.owner, size, self.lease_minutes, after=after, retries=True)
+        self.claimed += len(page)
+        self.retried += len(page)
+        return page
+
+    def __iter__(self):
+        while self._page:
+            page, self._page = self._page, []
+            for item in page:
+                yield item if self._retries else item[0]
+            self._page = self._claim_page(page[-1])
+
+
+def release_claims(conn, spec, owner):
+    conn.rollback()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {spec.ids_table} SET claimed_by = NULL, claimed_until = NULL WHERE claimed_by = %s",
+            (owner,),
+        )
+    conn.commit()
@@ -0,0 +1,109 @@
+import queue
+import threading
+
+from airflow.providers.postgres.hooks.postgres import PostgresHook
+
+from mis_2025_tasks.forms import FORMS
+from mis_2025_tasks.utils.content_engine import ingest_form_content
+from mis_2025_tasks.utils.fetch_odk_submission_list import fetch_odk_submission_list
+from mis_2025_tasks.utils.shards import claim_owner, release_claims
+
+_DONE = object()
+
+
+class ListStream:
+    """
+    Runs the submission list sync on a background thread and yields the
+    new IDs of each page as soon as the page is committed.
+
+    At most `max_pages` pages wait in the queue, which holds the list sync
+    back when downloads fall behind. While no page is waiting, None is
+    yielded every `poll_seconds`, so the consumer is never stuck here with
+    finished work in hand. After stop() the sync ends at its next page and
+    pages still to be handed over are dropped (their claims are released by
+    the consumer). `claimed` counts the IDs yielded so far.
+    """
+
+    def __init__(self, max_pages=4, poll_seconds=1.0):
+        self.poll_seconds = poll_seconds
+        self.claimed = 0
+        self.result = None
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_pages)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, **list_kwargs):
+        def run():
+            try:
+                self.result = fetch_odk_submission_list(
+                    **list_kwargs, on_new_ids=self._put, should_stop=self._stopped.is_set,
+                )
+            except BaseException as e:
+                self.error = e
+            finally:
+                self._put(_DONE)
+
+        self._thread = threading.Thread(target=run, name=f"{list_kwargs['form_id']}-list", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def __iter__(self):
+        while True:
+            try:
+                ids = self._queue.get(timeout=self.poll_seconds)
+            except queue.Empty:
+                yield None
+                continue
+            if ids is _DONE:
+                return
+            for submission_id in ids:
+                self.claimed += 1
+                yield submission_id
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def stream_form(**kwargs):
+    """
+    List sync and content ingestion of one form, overlapped.
+
+    Used as the `<form>_list` task when STREAM_LIST is on. New IDs found on
+    each submissionList page are inserted claimed by this task and
+    downloaded, parsed and written while the following pages are still
+    being listed, so the first records land within seconds of the run
+    starting. Records are written once the oldest has waited
+    WRITE_FLUSH_SECONDS (default 5), also while the list has nothing new
+    to hand over. The shards that follow drain whatever is left: older
+    backlog, retries, and anything this task did not reach.
+    """
+    spec = FORMS[kwargs["form"]]
+    STREAM_QUEUE_PAGES = int(kwargs.get("STREAM_QUEUE_PAGES", 4))
+    WRITE_FLUSH_SECONDS = float(kwargs.get("WRITE_FLUSH_SECONDS", 5))
+    owner = claim_owner(kwargs)
+    # Polled often enough that a due flush is at most a quarter late
+    stream = ListStream(STREAM_QUEUE_PAGES, poll_seconds=min(1.0, WRITE_FLUSH_SECONDS / 4))
+    stream.start(**{**kwargs, "form_id": spec.form_id, "target_table": spec.ids_table, "claim_for": owner})
+
+    try:
+        content = ingest_form_content(spec, **{**kwargs, "ids": stream, "flush_seconds": WRITE_FLUSH_SECONDS})
+    finally:
+        stream.stop()
+        # IDs the list sync claimed after the content task let go of its claims
+        pg = PostgresHook(postgres_conn_id=kwargs["POSTGRES_CONN_ID"])
+        with pg.get_conn() as conn:
+            release_claims(conn, spec, owner)
+
+    if stream.error is not None:
+        raise stream.error
+    return {"list": stream.result, "content": content}
@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Summary:
+    """
+    A count of a form table's rows per combination of `dimensions`.
+
+    The counts are kept current inside the transactions that change the
+    form table (see summary_schema_sql), so reading an indicator never
+    scans the form table. Missing answers are counted under ''.
+    """
+    table: str
+    source: str
+    dimensions: tuple
+
+
+def _delta_sql(summary, sources):
+    """
+    Queues one statement's change to the counts in the summary's pending
+    table: +1 per row of each (transition table, 1) source and -1 per row
+    of each (…, -1) source. Rows whose dimensions an update left alone
+    cancel out.
+    """
+    dims = ", ".join(summary.dimensions)
+    values = ", ".join(f"coalesce({d}::text, '')" for d in summary.dimensions)
+    rows = " UNION ALL ".join(f"SELECT {values}, {sign} FROM {name}" for name, sign in sources)
+    return f"""
+        INSERT INTO {summary.table}_pending (txid, {dims}, records)
+        SELECT txid_current(), {dims}, sum(n) FROM ({rows}) AS d ({dims}, n)
+        GROUP BY {dims} HAVING sum(n) <> 0;
+    """
+
+
+def summary_schema_sql(summary):
+    """
+    Statements creating a summary table and the statement-level triggers
+    that maintain it.
+
+    Each insert, update or delete on the form table (one batch upsert, a
+    dedup delete) queues its net change, read from transition tables, in
+    `{table}_pending`. At commit a deferred trigger moves the transaction's
+    queued changes into the counts in one statement, in dimension order.
+    An upsert that both inserts and updates fires two statement triggers;
+    applying their changes separately would lock summary rows in two
+    passes, and concurrent shards' batches could then deadlock on them.
+    This way every writer locks them in the same order, and only while
+    committing.
+
+    An upserted record that changed an answer moves its count from the old
+    value to the new one. A new summary table is seeded from the form table
+    with writes held off, so no row is counted twice or missed. Changing
+    `dimensions` needs a new table name.
+    """
+    t = summary.table
+    dims = ", ".join(summary.dimensions)
+    values = ", ".join(f"coalesce({d}::text, '')" for d in summary.dimensions)
+    triggers = {
+        "insert": "AFTER INSERT ON {source} REFERENCING NEW TABLE AS new_rows",
+        "update": "AFTER UPDATE ON {source} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+        "delete": "AFTER DELETE ON {source} REFERENCING OLD TABLE AS old_rows",
+    }
+    return [
+        f"""
+        DO $$
+        BEGIN
+            IF to_regclass('{t}') IS NULL THEN
+                CREATE TABLE {t} (
+                    {', '.join(f'{d} TEXT NOT NULL' for d in summary.dimensions)},
+                    records BIGINT NOT NULL,
+                    PRIMARY KEY ({dims})
+                );
+                LOCK TABLE {summary.source} IN SHARE ROW EXCLUSIVE MODE;
+                INSERT INTO {t} ({dims}, records)
+                SELECT {values}, count(*) FROM {summary.source} GROUP BY {values};
+            END IF;
+        END
+        $$
+        """,
+        f"""
+        DO $$
+        BEGIN
+            IF to_regclass('{t}_pending') IS NULL THEN
+                CREATE UNLOGGED TABLE {t}_pending (
+                    txid BIGINT NOT NULL,
+                    {', '.join(f'{d} TEXT NOT NULL' for d in summary.dimensions)},
+                    records BIGINT NOT NULL
+                );
+                CREATE INDEX {t}_pending_txid_idx ON {t}_pending (txid);
+            END IF;
+        END
+        $$
+        """,
+        f"""
+        CREATE OR REPLACE FUNCTION {t}_apply() RETURNS trigger LANGUAGE plpgsql AS $fn$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {_delta_sql(summary, [("new_rows", 1)])}
+            ELSIF TG_OP = 'UPDATE' THEN
+                {_delta_sql(summary, [("new_rows", 1), ("old_rows", -1)])}
+            ELSE
+                {_delta_sql(summary, [("old_rows", -1)])}
+            END IF;
+            RETURN NULL;
+        END
+        $fn$
+        """,
+        # Fires once per queued row; the first firing applies all of them
+        f"""
+        CREATE OR REPLACE FUNCTION {t}_flush() RETURNS trigger LANGUAGE plpgsql AS $fn$
+        BEGIN
+            WITH queued AS (
+                DELETE FROM {t}_pending WHERE txid = txid_current() RETURNING {dims}, records
+            )
+            INSERT INTO {t} AS s ({dims}, records)
+            SELECT {dims}, sum(records) FROM queued
+            GROUP BY {dims} HAVING sum(records) <> 0
+            ORDER BY {dims}
+            ON CONFLICT ({dims}) DO UPDATE SET records = s.records + EXCLUDED.records;
+            RETURN NULL;
+        END
+        $fn$
+        """,
+        f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_trigger WHERE tgrelid = '{t}_pending'::regclass AND tgname = '{t}_flush'
+            ) THEN
+                CREATE CONSTRAINT TRIGGER {t}_flush AFTER INSERT ON {t}_pending
+                DEFERRABLE INITIALLY DEFERRED
+                FOR EACH ROW EXECUTE FUNCTION {t}_flush();
+            END IF;
+        END
+        $$
+        """,
+    ] + [
+        f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_trigger WHERE tgrelid = '{summary.source}'::regclass AND tgname = '{t}_{event}'
+            ) THEN
+                CREATE TRIGGER {t}_{event} {clause.format(source=summary.source)}
+                FOR EACH STATEMENT EXECUTE FUNCTION {t}_apply();
+            END IF;
+        END
+        $$
+        """
+        for event, clause in triggers.items()
+    ]
@@ -0,0 +1,93 @@
+"""
+Unit tests for the helpers under dags/mis_2025_tasks/utils.
+
+They need neither Airflow nor Postgres: SQL paths run against
+fakes.FakeConnection, and where Airflow is not installed the few names the
+helpers import from it are registered as minimal stand-ins. Tests marked
+with the `pg_conn` fixture also run against a real database when
+MIS_TEST_DSN is set (e.g. postgresql://postgres@localhost/mis_test).
+"""
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "dags"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+def _stand_in(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+try:
+    import airflow  # noqa: F401
+except ImportError:
+    class PostgresHook:
+        def __init__(self, postgres_conn_id=None):
+            self.postgres_conn_id = postgres_conn_id
+
+        def get_conn(self):
+            raise RuntimeError("Patch PostgresHook with the fake_hook fixture")
+
+    class Stats:
+        @staticmethod
+        def timing(*args, **kwargs):
+            pass
+
+        @staticmethod
+        def incr(*args, **kwargs):
+            pass
+
+    class AirflowException(Exception):
+        pass
+
+    for name in ("airflow", "airflow.providers", "airflow.providers.postgres", "airflow.providers.postgres.hooks"):
+        _stand_in(name)
+    _stand_in("airflow.providers.postgres.hooks.postgres", PostgresHook=PostgresHook)
+    _stand_in("airflow.stats", Stats=Stats)
+    _stand_in(
+        "airflow.exceptions",
+        AirflowException=AirflowException,
+        AirflowFailException=type("AirflowFailException", (AirflowException,), {}),
+        AirflowSkipException=type("AirflowSkipException", (AirflowException,), {}),
+    )
+
+
+@pytest.fixture
+def fake_hook(monkeypatch):
+    """
+    Makes PostgresHook(...).get_conn() return the FakeConnection given,
+    in the module the task callable under test imported it into.
+    """
+    def install(module, conn):
+        class Hook:
+            def __init__(self, postgres_conn_id=None):
+                pass
+
+            def get_conn(self):
+                return conn
+
+        monkeypatch.setattr(module, "PostgresHook", Hook)
+        return conn
+
+    return install
+
+
+@pytest.fixture
+def pg_conn():
+    """A psycopg2 connection to MIS_TEST_DSN; the test is skipped without it."""
+    dsn = os.environ.get("MIS_TEST_DSN")
+    if not dsn:
+        pytest.skip("MIS_TEST_DSN is not set")
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    yield conn
+    conn.rollback()
+    conn.close()
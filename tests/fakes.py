@@ -0,0 +1,70 @@
+class FakeCursor:
+    def __init__(self, conn, name=None):
+        self.conn = conn
+        self.name = name
+        self.itersize = None
+        self.rowcount = -1
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.conn.executed.append((sql, params))
+        self._rows = list(self.conn.respond(sql, params))
+        self.rowcount = len(self._rows)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+
+class FakeConnection:
+    """
+    Stands in for a psycopg2 connection. Every statement is recorded in
+    `executed` as (whitespace-collapsed SQL, params) and answered with the
+    rows of the first `responses` entry whose key occurs in the SQL; a
+    callable entry is called with the params.
+    """
+
+    def __init__(self, responses=None):
+        self.responses = dict(responses or {})
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self, name=None):
+        return FakeCursor(self, name)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def respond(self, sql, params):
+        for fragment, rows in self.responses.items():
+            if fragment in sql:
+                return rows(params) if callable(rows) else rows
+        return []
+
+    def statements(self, fragment):
+        """Recorded (sql, params) pairs whose SQL contains `fragment`."""
+        return [(sql, params) for sql, params in self.executed if fragment in sql]
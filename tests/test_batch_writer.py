@@ -0,0 +1,157 @@
+from fakes import FakeConnection
+
+from mis_2025_tasks.utils import batch_writer
+from mis_2025_tasks.utils.batch_writer import BatchWriter
+
+COLUMNS = ("instanceid", "rowid", "name", "age")
+TYPES = {"instanceid": "text", "rowid": "text", "name": "text", "age": "integer"}
+
+
+def writer(conn, **kwargs):
+    return BatchWriter(conn, "people", "peopleids", columns=COLUMNS, **kwargs)
+
+
+def fake_conn():
+    return FakeConnection({"FROM pg_attribute": list(TYPES.items()), "FROM pg_prepared_statements": []})
+
+
+def record(instanceid, rowid=None, name=None, age=None):
+    return {"instanceid": instanceid, "rowid": rowid, "name": name, "age": age}
+
+
+def upserted(conn):
+    """The rows sent by the last EXECUTE, rebuilt from its column arrays."""
+    _, arrays = conn.statements("EXECUTE upsert_people_")[-1]
+    return [dict(zip(COLUMNS, row)) for row in zip(*arrays)]
+
+
+def test_repeated_keys_merge_later_non_null_values():
+    conn = fake_conn()
+    with conn.cursor() as cursor:
+        writer(conn)._upsert(cursor, [
+            record("a", rowid="r1", name="Abebe", age=30),
+            record("b", name="Tigist"),
+            record("a", name="Abebe K", age=None),
+            record("a", rowid=None, age=31),
+        ])
+    assert upserted(conn) == [
+        record("a", rowid="r1", name="Abebe K", age=31),
+        record("b", name="Tigist"),
+    ]
+
+
+def test_keyless_records_are_kept_apart():
+    conn = fake_conn()
+    with conn.cursor() as cursor:
+        writer(conn)._upsert(cursor, [record(None, name="x"), record(None, name="y"), record("a")])
+    assert upserted(conn) == [record("a"), record(None, name="x"), record(None, name="y")]
+
+
+def test_arrays_are_cast_to_the_column_types():
+    conn = fake_conn()
+    with conn.cursor() as cursor:
+        writer(conn)._upsert(cursor, [record("a", age=1)])
+    sql, _ = conn.statements("EXECUTE upsert_people_")[0]
+    assert sql.endswith("(%s::text[], %s::text[], %s::text[], %s::integer[])")
+
+
+def test_upsert_never_overwrites_with_null():
+    conn = fake_conn()
+    with conn.cursor() as cursor:
+        writer(conn)._upsert(cursor, [record("a")])
+    (prepare, _), = conn.statements("PREPARE upsert_people_")
+    assert "ON CONFLICT (instanceid) DO UPDATE SET" in prepare
+    for column in ("rowid", "name", "age"):
+        assert f"{column} = COALESCE(EXCLUDED.{column}, t.{column})" in prepare
+    assert "instanceid = COALESCE" not in prepare
+
+
+def test_statement_is_prepared_once_per_connection():
+    conn = fake_conn()
+    w = writer(conn)
+    with conn.cursor() as cursor:
+        w._upsert(cursor, [record("a")])
+        w._upsert(cursor, [record("b")])
+    assert len(conn.statements("PREPARE upsert_people_")) == 1
+    assert len(conn.statements("EXECUTE upsert_people_")) == 2
+
+    # A new writer on a connection that already has it only looks it up
+    conn.responses["FROM pg_prepared_statements"] = [(1,)]
+    with conn.cursor() as cursor:
+        writer(conn)._upsert(cursor, [record("c")])
+    assert len(conn.statements("PREPARE upsert_people_")) == 1
+
+
+def test_dedup_queue_gets_the_stored_keys():
+    conn = fake_conn()
+    with conn.cursor() as cursor:
+        writer(conn, dedup_queue="people_dedup_queue", dedup_key="rowid")._upsert(cursor, [record("a")])
+    (prepare, _), = conn.statements("PREPARE upsert_people_")
+    assert "RETURNING t.rowid" in prepare
+    assert "INSERT INTO people_dedup_queue SELECT DISTINCT rowid FROM upserted" in prepare
+
+
+def test_flush_if_due_writes_a_waiting_batch(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(batch_writer.time, "monotonic", lambda: clock[0])
+    # execute_values needs a real cursor; the statuses are not checked here
+    monkeypatch.setattr(batch_writer, "execute_values", lambda cursor, sql, rows, page_size: cursor.execute(sql, rows))
+    conn = fake_conn()
+    w = writer(conn, flush_seconds=5)
+    w.flush_if_due()
+    w.add("a", record("a"))
+    clock[0] += 4
+    w.flush_if_due()
+    assert not conn.statements("EXECUTE upsert_people_")
+    clock[0] += 1
+    w.flush_if_due()
+    assert len(conn.statements("EXECUTE upsert_people_")) == 1 and conn.commits == 1
+
+
+def test_coalesce_against_postgres(pg_conn):
+    with pg_conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TEMP TABLE people (instanceid TEXT PRIMARY KEY, rowid TEXT, name TEXT, age INTEGER);
+            CREATE TEMP TABLE peopleids (id TEXT PRIMARY KEY, status TEXT, attempts INTEGER NOT NULL DEFAULT 0,
+                                         last_error TEXT, next_attempt_at TIMESTAMPTZ);
+            INSERT INTO peopleids (id) VALUES ('a'), ('b');
+            INSERT INTO people VALUES ('a', 'r1', 'Abebe', 30);
+        """)
+    w = writer(pg_conn, batch_size=10)
+    w.add("a", record("a", name="Abebe K"))
+    w.add("a", record("a", age=31))
+    w.add("b", record("b", rowid="r2"))
+    w.flush()
+
+    with pg_conn.cursor() as cursor:
+        cursor.execute("SELECT instanceid, rowid, name, age FROM people ORDER BY 1")
+        assert cursor.fetchall() == [("a", "r1", "Abebe K", 31), ("b", "r2", None, None)]
+        cursor.execute("SELECT id, status FROM peopleids ORDER BY 1")
+        assert cursor.fetchall() == [("a", "success"), ("b", "success")]
+
+
+def test_reparse_writes_success_without_counting_an_attempt(pg_conn):
+    with pg_conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TEMP TABLE people (instanceid TEXT PRIMARY KEY, rowid TEXT, name TEXT, age INTEGER);
+            CREATE TEMP TABLE peopleids (id TEXT PRIMARY KEY, status TEXT, attempts INTEGER NOT NULL DEFAULT 0,
+                                         last_error TEXT, next_attempt_at TIMESTAMPTZ);
+            INSERT INTO peopleids VALUES ('a', 'dead', 2, 'invalid_data', NULL),
+                                         ('b', 'failed', 3, 'timeout', now() + interval '1 hour'),
+                                         ('c', 'success', 1, NULL, NULL);
+        """)
+    pg_conn.commit()  # the rejected batch is rolled back
+    w = writer(pg_conn, batch_size=10, record_attempts=False)
+    w.add("a", record("a", name="Abebe"))
+    w.add("b", record("b", age="not a number"))  # rejected by Postgres: left alone
+    w.add("c", record("c", name="Tigist"))
+    w.flush()
+
+    assert (w.total_success, w.total_failed) == (2, 1)
+    with pg_conn.cursor() as cursor:
+        cursor.execute("SELECT id, status, attempts, last_error, next_attempt_at IS NULL FROM peopleids ORDER BY 1")
+        assert cursor.fetchall() == [
+            ("a", "success", 2, "invalid_data", True),
+            ("b", "failed", 3, "timeout", False),
+            ("c", "success", 1, None, True),
+        ]
@@ -0,0 +1,85 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from mis_2025_tasks.utils.circuit_breaker import CircuitBreaker, is_outage_error, run_seconds_left, task_deadline
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status}", response=response)
+
+
+def test_outage_errors():
+    assert is_outage_error(requests.exceptions.ConnectionError())
+    assert is_outage_error(requests.exceptions.ReadTimeout())
+    assert is_outage_error(http_error(502))
+    assert not is_outage_error(http_error(404))
+    assert not is_outage_error(http_error(429))
+    assert not is_outage_error(requests.exceptions.HTTPError("no response"))
+    assert not is_outage_error(ValueError())
+
+
+def test_opens_after_threshold_consecutive_outages():
+    breaker = CircuitBreaker(threshold=3)
+    for _ in range(2):
+        breaker.record(http_error(503))
+    assert not breaker.is_open
+    breaker.record(requests.exceptions.ConnectTimeout())
+    assert breaker.is_open
+
+
+def test_any_other_answer_resets_the_count():
+    breaker = CircuitBreaker(threshold=3)
+    for answer in (http_error(503), http_error(503), None, http_error(503), http_error(503), http_error(404)):
+        breaker.record(answer)
+    assert not breaker.is_open and breaker.consecutive_failures == 0
+
+
+def test_stays_open():
+    breaker = CircuitBreaker(threshold=1)
+    breaker.record(http_error(500))
+    breaker.record()
+    assert breaker.is_open
+
+
+def test_threshold_is_at_least_one():
+    assert CircuitBreaker(threshold=0).threshold == 1
+
+
+def test_counts_outages_from_many_threads():
+    breaker = CircuitBreaker(threshold=400)
+    threads = [threading.Thread(target=lambda: [breaker.record(http_error(503)) for _ in range(50)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert breaker.consecutive_failures == 400 and breaker.is_open
+
+
+def dag_run(minutes_ago):
+    return SimpleNamespace(start_date=datetime.now(timezone.utc) - timedelta(minutes=minutes_ago))
+
+
+def test_run_seconds_left():
+    assert run_seconds_left({}) is None
+    assert run_seconds_left({"dag_run": dag_run(30), "RUN_BUDGET_MINUTES": 60}) == pytest.approx(1800, abs=5)
+    assert run_seconds_left({"dag_run": dag_run(400)}) == pytest.approx(-70 * 60, abs=5)
+
+
+def test_task_deadline_is_the_earlier_of_task_and_run_limits():
+    now = time.monotonic()
+    assert task_deadline({"TASK_DEADLINE_MINUTES": 10}) - now == pytest.approx(600, abs=5)
+    # Started early in the run: the task's own limit
+    kwargs = {"TASK_DEADLINE_MINUTES": 10, "RUN_BUDGET_MINUTES": 60, "dag_run": dag_run(5)}
+    assert task_deadline(kwargs) - now == pytest.approx(600, abs=5)
+    # A shard queued until late in the run: what is left of the budget
+    kwargs["dag_run"] = dag_run(55)
+    assert task_deadline(kwargs) - now == pytest.approx(300, abs=5)
+    kwargs["dag_run"] = dag_run(90)
+    assert task_deadline(kwargs) < now
@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fakes import FakeConnection
+
+from mis_2025_tasks.forms import CENSUS
+from mis_2025_tasks.utils import content_engine
+from mis_2025_tasks.utils.content_engine import ingest_form_content
+
+
+def test_a_shard_starting_after_the_run_budget_claims_nothing(fake_hook):
+    conn = fake_hook(content_engine, FakeConnection())
+    late = SimpleNamespace(start_date=datetime.now(timezone.utc) - timedelta(minutes=400))
+    result = ingest_form_content(
+        CENSUS, AGGREGATE_URL="http://aggregate", AGG_USERNAME="u", AGG_PASSWORD="p", POSTGRES_CONN_ID="test",
+        templates_dict={"shard": 3, "size": 2000}, dag_run=late,
+    )
+    assert result is None
+    assert not conn.executed
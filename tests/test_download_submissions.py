@@ -0,0 +1,70 @@
+import threading
+import time
+
+from mis_2025_tasks.utils.download_submissions import download_submissions
+
+
+class FakeSession:
+    """Answers every download with its URL after `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        time.sleep(self.delay)
+        return self
+
+    def raise_for_status(self):
+        pass
+
+    content = b"<data/>"
+
+
+def download(ids, session=None, **kwargs):
+    return download_submissions(session or FakeSession(), "http://aggregate", "census", ids, **kwargs)
+
+
+def test_yields_in_id_order():
+    ids = [f"uuid:{i}" for i in range(50)]
+    assert [sid for sid, _, _ in download(ids, max_workers=4)] == ids
+
+
+def test_finished_downloads_are_handed_over_while_the_source_waits():
+    handed_over = threading.Event()
+
+    def source():
+        yield "a"
+        # The next list page is slow; the stream says "nothing yet" until
+        # the consumer has had "a"
+        for _ in range(200):
+            if handed_over.is_set():
+                break
+            time.sleep(0.01)
+            yield None
+        yield "b"
+
+    session = FakeSession(delay=0.05)
+    seen = []
+    for submission_id, content, error in download(source(), session, max_workers=2):
+        seen.append(submission_id)
+        if submission_id == "a":
+            handed_over.set()
+    assert [sid for sid in seen if sid is not None] == ["a", "b"]
+    assert len(session.urls) == 2
+
+
+def test_idle_ticks_when_nothing_is_in_flight():
+    results = list(download(iter([None, None, "a"])))
+    assert results[:2] == [(None, None, None)] * 2
+    assert [sid for sid, _, _ in results[2:]] == ["a"]
+
+
+def test_no_new_downloads_after_should_stop():
+    stop = threading.Event()
+    seen = []
+    for submission_id, _, _ in download(iter(["a", None, "b", "c"]), max_workers=1, should_stop=stop.is_set):
+        seen.append(submission_id)
+        stop.set()
+    assert [sid for sid in seen if sid is not None] == ["a"]
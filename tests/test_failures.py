@@ -0,0 +1,48 @@
+import xml.etree.ElementTree as ET
+
+import psycopg2
+import pytest
+import requests
+
+from mis_2025_tasks.utils.failures import classify_failure
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status}", response=response)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (requests.exceptions.ReadTimeout(), ("timeout", True)),
+    (requests.exceptions.ConnectTimeout(), ("timeout", True)),
+    (requests.exceptions.ConnectionError(), ("connection", True)),
+    (http_error(500), ("http_500", True)),
+    (http_error(503), ("http_503", True)),
+    (http_error(429), ("http_429", True)),
+    (http_error(401), ("http_401", True)),
+    (requests.exceptions.HTTPError("no response"), ("http_None", True)),
+    (psycopg2.OperationalError(), ("OperationalError", True)),
+    (RuntimeError(), ("RuntimeError", True)),
+])
+def test_transient_failures_are_retried(error, expected):
+    assert classify_failure(error) == expected
+
+
+@pytest.mark.parametrize("error, expected", [
+    (http_error(404), ("http_404", False)),
+    (http_error(400), ("http_400", False)),
+    (ET.ParseError(), ("xml_syntax", False)),
+    (psycopg2.DataError(), ("db_rejected", False)),
+    (psycopg2.IntegrityError(), ("db_rejected", False)),
+    (ValueError("Could not find data block"), ("invalid_data", False)),
+])
+def test_deterministic_failures_go_dead(error, expected):
+    assert classify_failure(error) == expected
+
+
+def test_lxml_syntax_errors_are_deterministic():
+    etree = pytest.importorskip("lxml.etree")
+    with pytest.raises(etree.XMLSyntaxError) as info:
+        etree.fromstring(b"<data><unclosed></data>")
+    assert classify_failure(info.value) == ("xml_syntax", False)
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fake_aggregate import FakeAggregate, submission_ids
+
+from mis_2025_tasks.utils import fetch_odk_submission_list as fetch
+from mis_2025_tasks.utils.schema import SCHEMA_TABLES, TRACKING_COLUMNS
+
+
+@pytest.fixture
+def sync(pg_conn, fake_hook):
+    """Runs fetch_odk_submission_list for census against temp tables; returns its result."""
+    with pg_conn.cursor() as cursor:
+        cursor.execute(SCHEMA_TABLES[0].create.replace("CREATE TABLE IF NOT EXISTS", "CREATE TEMP TABLE"))
+        cursor.execute(f"CREATE TEMP TABLE censusids (id TEXT PRIMARY KEY, {', '.join(TRACKING_COLUMNS)})")
+    pg_conn.commit()
+    fake_hook(fetch, pg_conn)
+
+    def run(listed, pages=None, **kwargs):
+        seen = []
+
+        def stop():
+            seen.append(1)
+            return pages is not None and len(seen) > pages
+
+        with FakeAggregate({"census": listed}) as aggregate:
+            return fetch.fetch_odk_submission_list(
+                form_id="census", target_table="censusids", AGGREGATE_URL=aggregate.url,
+                AGG_USERNAME="u", AGG_PASSWORD="p", POSTGRES_CONN_ID="test",
+                NUM_ENTRIES=10, MAX_NUM_ENTRIES=10, should_stop=stop, **kwargs,
+            )
+
+    return run
+
+
+def state(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT resumption_cursor, last_full_sync_at IS NOT NULL, full_walk_started_at IS NOT NULL
+            FROM odk_sync_state WHERE form_id = 'census'
+        """)
+        row = cursor.fetchone()
+        cursor.execute("SELECT count(*) FROM censusids")
+        return row, cursor.fetchone()[0]
+
+
+def test_full_walk_resumes_then_syncs_incrementally(sync, pg_conn):
+    # No state yet: a full walk from the start, stopped after two pages
+    result = sync(30, pages=2)
+    assert (result["checked"], result["new"]) == (20, 20)
+    assert state(pg_conn) == (("20", False, True), 20)
+
+    # The interrupted walk carries on from its cursor and then completes
+    result = sync(30)
+    assert (result["checked"], result["new"]) == (10, 10)
+    assert state(pg_conn) == (("30", True, False), 30)
+
+    # Completed recently: only what was listed since is paged through
+    result = sync(45)
+    assert (result["checked"], result["new"]) == (15, 15)
+    assert state(pg_conn) == (("45", True, False), 45)
+
+
+def test_full_resync_param_walks_from_the_start(sync, pg_conn):
+    sync(25)
+    result = sync(25, params={"full_resync": True})
+    assert (result["checked"], result["new"], result["known"]) == (25, 0, 25)
+    # Every ID was known, so nothing went to Postgres
+    assert result["metrics"]["filtered"] == 25
+    assert state(pg_conn) == (("25", True, False), 25)
+
+
+def test_page_ids_and_cursor_commit_together(sync, pg_conn):
+    sync(30, pages=1)
+    with pg_conn.cursor() as cursor:
+        cursor.execute("SELECT id FROM censusids ORDER BY id")
+        assert [row[0] for row in cursor.fetchall()] == submission_ids("census", 0, 10)
+    assert state(pg_conn)[0] == ("10", False, True)
+
+
+def test_no_pages_once_the_run_budget_is_spent(sync, pg_conn):
+    late = SimpleNamespace(start_date=datetime.now(timezone.utc) - timedelta(minutes=400))
+    result = sync(30, dag_run=late)
+    assert result["checked"] == 0
+    # The walk it would have started is picked up by the next run
+    result = sync(30)
+    assert result["checked"] == 30
+    assert state(pg_conn) == (("30", True, False), 30)
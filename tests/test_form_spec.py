@@ -0,0 +1,100 @@
+import xml.etree.ElementTree as StdET
+
+import pytest
+from fake_aggregate import submission_ids, submission_xml
+
+from mis_2025_tasks.forms import CENSUS, FORMS, NET
+from mis_2025_tasks.utils.form_spec import NAMESPACES, find_data_block, parse_submission
+
+
+def find_parse(spec, content, submission_id):
+    """The per-field find() parser parse_submission replaced, kept as the reference."""
+    root = StdET.fromstring(content)
+    data_el = find_data_block(spec, root)
+    if data_el is None:
+        raise ValueError(f"Could not find {spec.form_id} data block for {submission_id}")
+
+    meta_el = data_el.find("orx:meta", NAMESPACES)
+
+    record = {}
+    for field in spec.fields:
+        if field.source == "attr":
+            raw = data_el.get(field.tag)
+        elif field.source == "meta":
+            el = meta_el.find(f"orx:{field.tag}", NAMESPACES) if meta_el is not None else None
+            raw = el.text if el is not None else None
+        else:
+            el = data_el.find(f"./default:{field.tag}", NAMESPACES)
+            raw = el.text.strip() if el is not None and el.text else None
+
+        value = field.convert(raw)
+        if len(field.columns) == 1:
+            record[field.columns[0]] = value
+        else:
+            record.update(zip(field.columns, value))
+    return record
+
+
+def submission(form_id, body, meta="<orx:rowID>row-1</orx:rowID>", instance_id="uuid:1"):
+    meta_el = f"<orx:meta><orx:instanceID>{instance_id}</orx:instanceID>{meta}</orx:meta>" if meta is not None else ""
+    return (
+        '<submission xmlns="http://opendatakit.org/submissions" xmlns:orx="http://openrosa.org/xforms">'
+        f'<data><data id="{form_id}" instanceID="{instance_id}">{body}{meta_el}</data></data></submission>'
+    ).encode()
+
+
+@pytest.mark.parametrize("name", sorted(FORMS))
+def test_matches_find_parser_on_generated_submissions(name):
+    spec = FORMS[name]
+    for submission_id in submission_ids(name, 0, 200):
+        content = submission_xml(spec, submission_id)
+        assert parse_submission(spec, content, submission_id) == find_parse(spec, content, submission_id)
+
+
+@pytest.mark.parametrize("body, meta", [
+    # Missing and empty elements, surrounding whitespace
+    ("<headName>  Abebe \n</headName><placeName/><houseNumber></houseNumber>", "<orx:rowID>row-1</orx:rowID>"),
+    # A repeated tag: the first occurrence wins
+    ("<headName>first</headName><headName>second</headName>", "<orx:rowID>a</orx:rowID><orx:rowID>b</orx:rowID>"),
+    # Same tag nested deeper is not a child of <data>
+    ("<group><headName>nested</headName></group>", "<orx:rowID>row-1</orx:rowID>"),
+    # Partial and malformed GPS strings, defaults for empty numbers
+    ("<location>9.1 38.7</location><random></random><selected/>", "<orx:rowID>row-1</orx:rowID>"),
+    ("<location>9.1 north</location>", "<orx:rowID>row-1</orx:rowID>"),
+    # No meta block at all, or an empty one
+    ("<headName>x</headName>", None),
+    ("<headName>x</headName>", ""),
+])
+def test_matches_find_parser_on_edge_cases(body, meta):
+    content = submission(CENSUS.form_id, body, meta)
+    assert parse_submission(CENSUS, content, "uuid:1") == find_parse(CENSUS, content, "uuid:1")
+
+
+def test_record_values():
+    content = submission(
+        CENSUS.form_id, "<headName> Abebe </headName><location>9.5 38.25 2300 5</location><selected>3</selected>",
+    )
+    record = parse_submission(CENSUS, content, "uuid:1")
+    assert record["instanceID"] == "uuid:1"
+    assert record["rowID"] == "row-1"
+    assert record["headName"] == "Abebe"
+    assert (record["latitude"], record["longitude"], record["altitude"], record["accuracy"]) == (9.5, 38.25, 2300, 5)
+    assert record["selected"] == 3
+    assert record["random"] == 0
+    assert record["placeName"] is None
+    assert set(record) == set(CENSUS.columns)
+
+
+def test_any_data_block_falls_back_to_first_inner_block():
+    content = submission("net_v2", "")
+    assert parse_submission(NET, content, "uuid:1") == find_parse(NET, content, "uuid:1")
+    with pytest.raises(ValueError, match="data block"):
+        parse_submission(CENSUS, submission("census_v2", ""), "uuid:1")
+
+
+def test_unconvertible_value_raises_like_find_parser():
+    content = submission(CENSUS.form_id, "<selected>many</selected>")
+    with pytest.raises(ValueError):
+        find_parse(CENSUS, content, "uuid:1")
+    with pytest.raises(ValueError):
+        parse_submission(CENSUS, content, "uuid:1")
@@ -0,0 +1,21 @@
+from fakes import FakeConnection
+
+from mis_2025_tasks.utils.known_ids import KnownIds
+
+
+def test_load_streams_and_answers_membership():
+    ids = [f"uuid:{i:05d}" for i in range(1000)]
+    conn = FakeConnection({"SELECT id FROM peopleids": [(i,) for i in ids]})
+    known = KnownIds.load(conn, "peopleids", chunk_size=64)
+
+    assert len(known) == 1000
+    assert all(i in known for i in ids)
+    assert not any(f"uuid:{i:05d}" in known for i in range(1000, 1100))
+    assert list(known._hashes) == sorted(known._hashes)
+    assert conn.commits == 1
+
+
+def test_empty_table():
+    known = KnownIds.load(FakeConnection(), "peopleids")
+    assert len(known) == 0
+    assert "uuid:1" not in known
@@ -0,0 +1,44 @@
+import pytest
+
+from mis_2025_tasks.utils.metrics import SECONDS_BUCKETS, Histogram
+
+
+def histogram(values):
+    h = Histogram(SECONDS_BUCKETS)
+    for value in values:
+        h.observe(value)
+    return h
+
+
+def test_quantile_is_the_upper_bound_of_its_bucket():
+    h = histogram([0.003] * 50 + [0.07] * 45 + [0.3] * 5)
+    assert h.quantile(0.5) == 0.005
+    assert h.quantile(0.95) == 0.1
+    assert h.quantile(0.99) == 0.3
+
+
+def test_quantile_is_capped_at_the_max():
+    assert histogram([0.003]).quantile(0.5) == 0.003
+    assert histogram([0.2, 0.2]).quantile(0.95) == 0.2
+
+
+def test_values_past_the_last_bucket():
+    h = histogram([0.01, 120])
+    assert h.quantile(0.5) == 0.01
+    assert h.quantile(0.99) == 120
+
+
+def test_bucket_bounds_are_inclusive():
+    h = histogram([0.05, 0.05])
+    assert h.counts[SECONDS_BUCKETS.index(0.05)] == 2
+    assert h.quantile(0.5) == 0.05
+
+
+def test_empty():
+    assert histogram([]).quantile(0.95) == 0.0
+
+
+def test_count_sum_max():
+    h = histogram([0.5, 1.5, 3])
+    assert (h.count, h.max) == (3, 3)
+    assert h.sum == pytest.approx(5.0)
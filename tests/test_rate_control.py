@@ -0,0 +1,75 @@
+import requests
+
+from mis_2025_tasks.utils.rate_control import AimdLimit, is_congestion
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status}", response=response)
+
+
+def test_congestion_errors():
+    assert is_congestion(http_error(429))
+    assert is_congestion(http_error(503))
+    assert is_congestion(requests.exceptions.ReadTimeout())
+    assert is_congestion(requests.exceptions.ConnectionError())
+    assert not is_congestion(http_error(404))
+    assert not is_congestion(ValueError())
+
+
+def test_start_is_clamped():
+    assert AimdLimit("x", 50, minimum=1, maximum=10).value == 10
+    assert AimdLimit("x", 0, minimum=2, maximum=10).value == 2
+    assert AimdLimit("x", 8).maximum == 8
+
+
+def test_a_round_of_healthy_responses_adds_a_step():
+    limit = AimdLimit("x", 4, maximum=10, step=2)
+    for _ in range(3):
+        limit.observe(0.1)
+    assert limit.value == 4
+    limit.observe(0.1)
+    assert limit.value == 6
+    for _ in range(20):
+        limit.observe(0.1)
+    assert limit.value == 10
+
+
+def test_congestion_halves_then_waits_a_round():
+    limit = AimdLimit("x", 8, maximum=16)
+    limit.observe(error=http_error(429))
+    assert limit.value == 4
+    # A round at the old limit is still in flight; those responses are ignored
+    for _ in range(8):
+        limit.observe(error=http_error(503))
+    assert limit.value == 4
+    limit.observe(error=http_error(503))
+    assert limit.value == 2
+
+
+def test_never_below_minimum():
+    limit = AimdLimit("x", 4, minimum=3, rounds_of=1)
+    for _ in range(10):
+        limit.observe(error=requests.exceptions.ReadTimeout())
+    assert limit.value == 3
+
+
+def test_other_errors_say_nothing_about_load():
+    limit = AimdLimit("x", 4, maximum=10, rounds_of=1)
+    limit.observe(error=http_error(404))
+    assert limit.value == 4
+    limit.observe(0.1)
+    assert limit.value == 5
+
+
+def test_latency_climbing_past_tolerance_halves():
+    limit = AimdLimit("x", 8, maximum=8, latency_tolerance=2.0)
+    for _ in range(8):
+        limit.observe(0.1)
+    assert limit.value == 8
+    for _ in range(10):
+        limit.observe(1.0)
+        if limit.value < 8:
+            break
+    assert limit.value == 4
@@ -0,0 +1,81 @@
+import random
+
+from mis_2025_tasks.census import remove_duplicate
+from mis_2025_tasks.census.remove_duplicate import remove_duplicate_census
+from mis_2025_tasks.utils.batch_writer import BatchWriter
+
+COLUMNS = ("instanceID", "rowID", "selected", "random")
+
+# The full-table pass remove_duplicate_census replaced, kept as the reference
+FULL_TABLE_DEDUP = """
+    WITH prioritized_rows AS (
+        SELECT instanceID,
+               ROW_NUMBER() OVER (
+                   PARTITION BY rowID
+                   ORDER BY (selected > 0) DESC, (random > 0) DESC, instanceID ASC
+               ) AS rn
+        FROM census_full
+    )
+    DELETE FROM census_full
+    WHERE instanceID IN (SELECT instanceID FROM prioritized_rows WHERE rn > 1)
+"""
+
+
+def batches(seed, count=6, size=80):
+    """Census records for a few dozen rowIDs (some NULL), re-sent now and then with new values."""
+    rng = random.Random(seed)
+    sent = []
+    for b in range(count):
+        batch = []
+        for i in range(size):
+            if sent and rng.random() < 0.15:
+                instance_id = rng.choice(sent)
+            else:
+                instance_id = f"uuid:{b:02d}-{i:03d}"
+                sent.append(instance_id)
+            row_id = None if rng.random() < 0.05 else f"row-{rng.randrange(40)}"
+            batch.append({"instanceID": instance_id, "rowID": row_id,
+                          "selected": rng.choice([0, 1]), "random": rng.choice([0, 0.5])})
+        yield batch
+
+
+def survivors(conn, table):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT instanceID, rowID, selected, random FROM {table} ORDER BY 1")
+        return cursor.fetchall()
+
+
+def test_queued_dedup_matches_the_full_table_pass(pg_conn, fake_hook):
+    with pg_conn.cursor() as cursor:
+        for table in ("census", "census_full"):
+            cursor.execute(f"""
+                CREATE TEMP TABLE {table} (instanceID TEXT PRIMARY KEY, rowID TEXT, selected INTEGER, random NUMERIC);
+                CREATE TEMP TABLE {table}ids (id TEXT PRIMARY KEY, status TEXT, attempts INTEGER NOT NULL DEFAULT 0,
+                                              last_error TEXT, next_attempt_at TIMESTAMPTZ);
+            """)
+        cursor.execute("CREATE TEMP TABLE census_dedup_queue (rowID TEXT)")
+    pg_conn.commit()
+    fake_hook(remove_duplicate, pg_conn)
+
+    queued = BatchWriter(pg_conn, "census", "censusids", "instanceID", batch_size=1000,
+                         dedup_queue="census_dedup_queue", dedup_key="rowID", columns=COLUMNS)
+    plain = BatchWriter(pg_conn, "census_full", "census_fullids", "instanceID", batch_size=1000, columns=COLUMNS)
+    for n, batch in enumerate(batches(seed=11)):
+        for writer in (queued, plain):
+            for record in batch:
+                writer.add(record["instanceID"], record)
+            writer.flush()
+        # Dedup runs after some batches only, so rowIDs pile up in the queue
+        if n % 2:
+            remove_duplicate_census(POSTGRES_CONN_ID="test")
+            with pg_conn.cursor() as cursor:
+                cursor.execute(FULL_TABLE_DEDUP)
+            pg_conn.commit()
+            assert survivors(pg_conn, "census") == survivors(pg_conn, "census_full")
+
+    with pg_conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM census_dedup_queue")
+        assert cursor.fetchone() == (0,)
+        cursor.execute("SELECT count(*), count(DISTINCT rowID) FROM census WHERE rowID IS NOT NULL")
+        total, distinct = cursor.fetchone()
+        assert total == distinct
@@ -0,0 +1,64 @@
+import re
+
+import pytest
+
+from mis_2025_tasks.utils import schema
+from mis_2025_tasks.utils.schema import ensure_schema
+
+
+@pytest.fixture
+def scratch(pg_conn, fake_hook):
+    """pg_conn with an empty schema as its search_path, dropped afterwards."""
+    with pg_conn.cursor() as cursor:
+        cursor.execute("CREATE SCHEMA mis_schema_test")
+        cursor.execute("SET search_path TO mis_schema_test")
+    pg_conn.commit()
+    fake_hook(schema, pg_conn)
+    yield pg_conn
+    pg_conn.rollback()
+    with pg_conn.cursor() as cursor:
+        cursor.execute("DROP SCHEMA mis_schema_test CASCADE")
+    pg_conn.commit()
+
+
+def changes(capsys):
+    ensure_schema(POSTGRES_CONN_ID="test")
+    out = capsys.readouterr().out
+    return int(re.search(r"\((\d+) columns or indexes added\)", out).group(1)), out
+
+
+def test_second_run_changes_nothing(scratch, capsys):
+    first, _ = changes(capsys)
+    assert first > 0
+    second, out = changes(capsys)
+    assert second == 0
+    assert ": added" not in out
+
+
+def test_only_what_is_missing_is_added(scratch, capsys):
+    changes(capsys)
+    with scratch.cursor() as cursor:
+        cursor.execute("ALTER TABLE census DROP COLUMN sampleFrame")
+        cursor.execute("DROP INDEX censusids_retry_idx")
+        # The index fresh_idx and retry_idx replaced
+        cursor.execute("CREATE INDEX censusids_pending_idx ON censusids (id) WHERE status IS NULL")
+    scratch.commit()
+
+    added, out = changes(capsys)
+    assert added == 2
+    assert "census: added sampleFrame" in out
+    assert "censusids: added censusids_retry_idx" in out
+    with scratch.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('censusids_pending_idx')")
+        assert cursor.fetchone() == (None,)
+
+
+def test_existing_rows_keep_their_values(scratch, capsys):
+    changes(capsys)
+    with scratch.cursor() as cursor:
+        cursor.execute("INSERT INTO censusids (id, status, attempts) VALUES ('a', 'failed', 3)")
+    scratch.commit()
+    changes(capsys)
+    with scratch.cursor() as cursor:
+        cursor.execute("SELECT status, attempts FROM censusids")
+        assert cursor.fetchall() == [("failed", 3)]
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fakes import FakeConnection
+
+from mis_2025_tasks.utils import shards
+from mis_2025_tasks.utils.schema import TRACKING_COLUMNS
+from mis_2025_tasks.utils.shards import PendingIds, claim_pending_ids, plan_content_shards
+
+SPEC = SimpleNamespace(name="people", ids_table="peopleids")
+T0 = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+class FakeQueue:
+    """
+    In-memory tracking table answering claim_pending_ids the way its SQL
+    does: fresh IDs newest first, then due retries by id, keyset paged.
+    """
+
+    def __init__(self, fresh=(), retries=()):
+        self.fresh = [(f"f{i}", T0 + timedelta(minutes=i)) for i in fresh]
+        self.retries = sorted(f"r{i:02d}" for i in retries)
+        self.claimed = set()
+        self.calls = []
+
+    def claim(self, conn, spec, owner, limit=None, lease_minutes=120, after=None, retries=False):
+        self.calls.append((limit, after, retries))
+        if retries:
+            rows = [i for i in self.retries if i not in self.claimed and (after is None or i > after)]
+        else:
+            rows = sorted(self.fresh, key=lambda row: (row[1], row[0]), reverse=True)
+            rows = [r for r in rows if r[0] not in self.claimed and (after is None or (r[1], r[0]) < (after[1], after[0]))]
+        rows = rows[:limit]
+        self.claimed.update(row if retries else row[0] for row in rows)
+        return rows
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    def install(**kwargs):
+        q = FakeQueue(**kwargs)
+        monkeypatch.setattr(shards, "claim_pending_ids", q.claim)
+        return q
+
+    return install
+
+
+def test_fresh_newest_first_then_retries_by_id(queue):
+    q = queue(fresh=range(5), retries=(3, 1, 2))
+    pending = PendingIds(None, SPEC, "me", page_size=2)
+    assert list(pending) == ["f4", "f3", "f2", "f1", "f0", "r01", "r02", "r03"]
+    assert (pending.claimed, pending.retried) == (8, 3)
+    assert all(limit == 2 for limit, _, _ in q.calls)
+
+
+def test_claims_a_page_only_when_the_consumer_gets_there(queue):
+    q = queue(fresh=range(5))
+    pending = PendingIds(None, SPEC, "me", page_size=2)
+    assert not pending.empty and len(q.calls) == 1
+    ids = iter(pending)
+    next(ids), next(ids)
+    assert len(q.calls) == 1
+    next(ids)
+    assert len(q.calls) == 2
+
+
+def test_retries_capped_at_retry_share_of_the_limit(queue):
+    queue(fresh=range(3), retries=range(10))
+    pending = PendingIds(None, SPEC, "me", limit=8, page_size=2, retry_share=0.25)
+    assert list(pending) == ["f2", "f1", "f0", "r00", "r01"]
+    assert (pending.claimed, pending.retried, pending.max_retries) == (5, 2, 2)
+
+
+def test_limit_stops_claiming(queue):
+    q = queue(fresh=range(10), retries=range(3))
+    pending = PendingIds(None, SPEC, "me", limit=5, page_size=2, retry_share=1.0)
+    assert list(pending) == ["f9", "f8", "f7", "f6", "f5"]
+    assert [limit for limit, _, _ in q.calls] == [2, 2, 1]
+
+
+def test_retries_fill_a_shard_without_fresh_ids(queue):
+    queue(retries=range(4))
+    pending = PendingIds(None, SPEC, "me", limit=10, page_size=3, retry_share=0.25)
+    assert list(pending) == ["r00", "r01", "r02"]
+
+
+def test_nothing_pending(queue):
+    queue()
+    assert PendingIds(None, SPEC, "me").empty
+
+
+def test_claim_sql_orders_and_pages_fresh_ids():
+    conn = FakeConnection({"WITH picked": [("f1", T0)]})
+    assert claim_pending_ids(conn, SPEC, "me", 50, 30, after=("f2", T0)) == [("f1", T0)]
+    (sql, params), = conn.executed
+    assert "ORDER BY first_seen_at DESC, id DESC LIMIT %(limit)s FOR UPDATE SKIP LOCKED" in sql
+    assert "(first_seen_at, id) < (%(after_seen)s, %(after)s)" in sql
+    assert params == {"owner": "me", "lease": 30, "limit": 50, "after": "f2", "after_seen": T0}
+    assert conn.commits == 1
+
+
+def test_claim_sql_returns_retry_ids_in_id_order():
+    conn = FakeConnection({"WITH picked": [("r1",), ("r2",)]})
+    assert claim_pending_ids(conn, SPEC, "me", 10, after="r0", retries=True) == ["r1", "r2"]
+    (sql, params), = conn.executed
+    assert "status = 'failed'" in sql and "id > %(after)s" in sql
+    assert "ORDER BY id LIMIT %(limit)s FOR UPDATE SKIP LOCKED" in sql
+    assert params["after"] == "r0" and params["after_seen"] is None
+
+
+@pytest.mark.parametrize("pending, shards_made, size", [(0, 0, 2000), (4500, 3, 2000), (100000, 16, 6250)])
+def test_plan_content_shards(fake_hook, pending, shards_made, size):
+    conn = fake_hook(shards, FakeConnection({"SELECT count(*)": [(pending,)]}))
+    plan = plan_content_shards(form="census", POSTGRES_CONN_ID="test", SHARD_SIZE=2000, MAX_SHARDS=16)
+    assert plan == [{"shard": i, "size": size} for i in range(shards_made)]
+    assert not conn.statements("status = 'dead'")
+
+
+def test_no_shards_once_the_run_budget_is_spent(fake_hook):
+    conn = fake_hook(shards, FakeConnection({"SELECT count(*)": [(4500,)]}))
+    started = SimpleNamespace(start_date=datetime.now(timezone.utc) - timedelta(minutes=331))
+    assert plan_content_shards(form="census", POSTGRES_CONN_ID="test", dag_run=started) == []
+    assert not conn.executed
+    started.start_date += timedelta(minutes=60)
+    assert len(plan_content_shards(form="census", POSTGRES_CONN_ID="test", dag_run=started)) == 3
+
+
+def test_plan_content_shards_resets_dead_ids(fake_hook):
+    conn = fake_hook(shards, FakeConnection({"SELECT count(*)": [(0,)]}))
+    plan_content_shards(form="census", POSTGRES_CONN_ID="test", params={"reset_dead": True})
+    (sql, _), = conn.statements("WHERE status = 'dead'")
+    assert sql.startswith("UPDATE censusids SET status = NULL")
+
+
+def test_claim_order_against_postgres(pg_conn):
+    with pg_conn.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE peopleids (id TEXT PRIMARY KEY, {', '.join(TRACKING_COLUMNS)})")
+        cursor.execute("""
+            INSERT INTO peopleids (id, status, first_seen_at, next_attempt_at, claimed_until) VALUES
+                ('f1', NULL, '2025-03-01 10:00+00', NULL, NULL),
+                ('f2', NULL, '2025-03-01 12:00+00', NULL, NULL),
+                ('f3', NULL, '2025-03-01 12:00+00', NULL, NULL),
+                ('f4', NULL, '2025-03-01 11:00+00', NULL, now() + interval '1 hour'),
+                ('r2', 'failed', '2025-03-01 09:00+00', NULL, NULL),
+                ('r1', 'failed', '2025-03-01 13:00+00', now() - interval '1 minute', NULL),
+                ('r3', 'failed', '2025-03-01 13:00+00', now() + interval '1 hour', NULL),
+                ('d1', 'dead', '2025-03-01 14:00+00', NULL, NULL),
+                ('s1', 'success', '2025-03-01 14:00+00', NULL, NULL)
+        """)
+    pending = PendingIds(pg_conn, SPEC, "me", page_size=2)
+    # Not yet due (r3), claimed by someone else (f4), dead and done are skipped
+    assert list(pending) == ["f3", "f2", "f1", "r1", "r2"]
+    with pg_conn.cursor() as cursor:
+        cursor.execute("SELECT id FROM peopleids WHERE claimed_by = 'me' ORDER BY id")
+        assert [row[0] for row in cursor.fetchall()] == ["f1", "f2", "f3", "r1", "r2"]
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+
+import psycopg2
+import pytest
+from fake_aggregate import FakeAggregate, submission_ids
+
+from mis_2025_tasks.utils import content_engine, fetch_odk_submission_list, schema, streaming
+from mis_2025_tasks.utils.schema import ensure_schema
+from mis_2025_tasks.utils.streaming import stream_form
+
+
+@pytest.fixture
+def connect(pg_conn, monkeypatch):
+    """
+    Opens connections to MIS_TEST_DSN inside an empty schema, dropped
+    afterwards. The list thread and the writer need connections of their
+    own, so every PostgresHook(...).get_conn() opens a new one.
+    """
+    with pg_conn.cursor() as cursor:
+        cursor.execute("CREATE SCHEMA mis_stream_test")
+    pg_conn.commit()
+
+    def connect():
+        return psycopg2.connect(os.environ["MIS_TEST_DSN"], options="-c search_path=mis_stream_test")
+
+    class Hook:
+        def __init__(self, postgres_conn_id=None):
+            pass
+
+        def get_conn(self):
+            return connect()
+
+    for module in (content_engine, fetch_odk_submission_list, schema, streaming):
+        monkeypatch.setattr(module, "PostgresHook", Hook)
+    ensure_schema(POSTGRES_CONN_ID="test")
+    yield connect
+    with pg_conn.cursor() as cursor:
+        cursor.execute("DROP SCHEMA mis_stream_test CASCADE")
+    pg_conn.commit()
+
+
+def test_records_land_while_the_list_is_still_paging(connect):
+    # A full walk where only the first page has new IDs, and every page is slow
+    listed, new = 800, 20
+    conn = connect()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO censusids (id, status) SELECT unnest(%s::text[]), 'success'",
+            (submission_ids("census", new, listed),),
+        )
+    conn.commit()
+
+    landed = []
+
+    def watch():
+        with conn.cursor() as cursor:
+            while not done.is_set():
+                cursor.execute("SELECT count(*) FROM census")
+                if cursor.fetchone()[0] == new:
+                    landed.append(time.monotonic())
+                    return
+                conn.rollback()
+                time.sleep(0.05)
+
+    done = threading.Event()
+    watcher = threading.Thread(target=watch)
+    with FakeAggregate({"census": listed}, latency_ms=100) as aggregate:
+        watcher.start()
+        started = time.monotonic()
+        result = stream_form(
+            form="census", AGGREGATE_URL=aggregate.url, AGG_USERNAME="u", AGG_PASSWORD="p",
+            POSTGRES_CONN_ID="test", NUM_ENTRIES=20, MAX_NUM_ENTRIES=20, WRITE_FLUSH_SECONDS=0.5,
+        )
+        finished = time.monotonic()
+    done.set()
+    watcher.join()
+    conn.close()
+
+    assert result["list"]["new"] == new and result["content"]["success"] == new
+    # Listing 41 pages takes over 4s; the 20 downloads are done in well
+    # under one, so they must be written long before the list ends
+    assert finished - started > 4
+    assert landed and landed[0] - started < 2
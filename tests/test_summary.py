@@ -0,0 +1,117 @@
+import os
+import random
+import threading
+
+import psycopg2
+import pytest
+
+from mis_2025_tasks.indicators import SUMMARIES
+from mis_2025_tasks.utils import schema
+from mis_2025_tasks.utils.batch_writer import BatchWriter
+from mis_2025_tasks.utils.schema import ensure_schema
+
+FORM_COLUMNS = {
+    "household": ("instanceid", "region", "zone", "district", "ea", "have_nets"),
+    "member": ("instanceid", "sleep_under_net", "rdt_result"),
+}
+ANSWERS = ("yes", "no", None)
+
+
+@pytest.fixture
+def connect(pg_conn, monkeypatch):
+    """Connections to MIS_TEST_DSN inside a schema ensure_schema has set up, dropped afterwards."""
+    with pg_conn.cursor() as cursor:
+        cursor.execute("CREATE SCHEMA mis_summary_test")
+    pg_conn.commit()
+
+    def connect():
+        return psycopg2.connect(os.environ["MIS_TEST_DSN"], options="-c search_path=mis_summary_test")
+
+    class Hook:
+        def __init__(self, postgres_conn_id=None):
+            pass
+
+        def get_conn(self):
+            return connect()
+
+    monkeypatch.setattr(schema, "PostgresHook", Hook)
+    ensure_schema(POSTGRES_CONN_ID="test")
+    yield connect
+    with pg_conn.cursor() as cursor:
+        cursor.execute("DROP SCHEMA mis_summary_test CASCADE")
+    pg_conn.commit()
+
+
+def record(form, instance_id, rng):
+    values = {c: rng.choice(ANSWERS) for c in FORM_COLUMNS[form][1:]}
+    if form == "household":
+        values.update(region=f"r{rng.randrange(2)}", zone=f"z{rng.randrange(3)}", ea=f"ea-{rng.randrange(20)}")
+    return {"instanceid": instance_id, **values}
+
+
+def run_shards(connect, shards, batches, resend_share=0.0):
+    """
+    Writes `batches` batches per shard for both forms, all shards at once.
+    Each shard writes IDs of its own, and re-sends `resend_share` of them
+    with new answers, so batches mix inserts and updates.
+    """
+    start = threading.Barrier(len(shards) * 2)
+    errors = []
+
+    def shard(form, k):
+        rng = random.Random(f"{form}-{k}")
+        conn = connect()
+        try:
+            writer = BatchWriter(conn, form, f"{form}ids", batch_size=50, columns=FORM_COLUMNS[form])
+            sent = []
+            start.wait()
+            for b in range(batches):
+                for i in range(50):
+                    if sent and rng.random() < resend_share:
+                        instance_id = rng.choice(sent)
+                    else:
+                        instance_id = f"uuid:{k}-{b}-{i}"
+                        sent.append(instance_id)
+                    writer.add(instance_id, record(form, instance_id, rng))
+            writer.flush()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=shard, args=(form, k)) for form in FORM_COLUMNS for k in shards]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+def assert_summaries_match(connect):
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            for summary in SUMMARIES:
+                dims = ", ".join(summary.dimensions)
+                values = ", ".join(f"coalesce({d}::text, '')" for d in summary.dimensions)
+                cursor.execute(f"SELECT {dims}, records FROM {summary.table} WHERE records <> 0 ORDER BY {dims}")
+                kept = cursor.fetchall()
+                cursor.execute(f"SELECT {values}, count(*) FROM {summary.source} GROUP BY {values} ORDER BY {values}")
+                assert kept == cursor.fetchall(), summary.table
+                cursor.execute(f"SELECT count(*) FROM {summary.table}_pending")
+                assert cursor.fetchone() == (0,), summary.table
+    finally:
+        conn.close()
+
+
+def test_concurrent_shards_keep_summaries_exact(connect, capsys):
+    # New submissions only
+    run_shards(connect, shards=range(6), batches=8)
+    assert "one by one" not in capsys.readouterr().out
+    assert_summaries_match(connect)
+
+    # Re-sent submissions with changed answers move counts between rows; a
+    # batch that deadlocks on them is retried whole, never row by row
+    run_shards(connect, shards=range(6, 12), batches=8, resend_share=0.3)
+    assert "one by one" not in capsys.readouterr().out
+    assert_summaries_match(connect)